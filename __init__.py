@@ -37,6 +37,17 @@ bl_info = {
 if "bpy" in locals():
     import importlib
     importlib.reload(get_image_size)
+    importlib.reload(tsynth_memory)
+    importlib.reload(tsynth_cache)
+    importlib.reload(tsynth_telemetry)
+    importlib.reload(tsynth_jobs)
+    importlib.reload(tsynth_command)
+    importlib.reload(tsynth_queue)
+    importlib.reload(tsynth_sheet)
+    importlib.reload(tsynth_png)
+    importlib.reload(tsynth_tiles)
+    importlib.reload(tsynth_thumbs)
+    importlib.reload(tsynth_guides)
     importlib.reload(tsynth_props)
     importlib.reload(utils)
     importlib.reload(addon_preferences)
@@ -44,6 +55,17 @@ if "bpy" in locals():
     importlib.reload(main_operators)
 else:
     from . import get_image_size
+    from . import tsynth_memory
+    from . import tsynth_cache
+    from . import tsynth_telemetry
+    from . import tsynth_jobs
+    from . import tsynth_command
+    from . import tsynth_queue
+    from . import tsynth_sheet
+    from . import tsynth_png
+    from . import tsynth_tiles
+    from . import tsynth_thumbs
+    from . import tsynth_guides
     from . import tsynth_props
     from . import utils
     from . import addon_preferences
@@ -51,6 +73,7 @@ else:
     from . import main_operators
 
 import bpy
+import atexit
 
 
 # We can store multiple preview collections here,
@@ -68,6 +91,8 @@ classes = (
     tsynth_props.SelectedImages,
     tsynth_props.TextSynth_Settings,
     main_operators.TSYNTH_OT_TextureSynthesis,
+    main_operators.TSYNTH_OT_ParameterSweep,
+    main_operators.TSYNTH_OT_ExportJobQueue,
     main_operators.TSYNTH_OT_RefreshDir,
 )
 
@@ -76,10 +101,17 @@ def register():
         bpy.utils.register_class(cls)
     bpy.types.Scene.tsynth_params = bpy.props.PointerProperty(type=tsynth_props.TextSynth_Settings)
     tsynth_props.register_thumbs()
+    tsynth_props.load_metadata_cache()
+    atexit.register(tsynth_props.save_metadata_cache)  # blender does not unregister addons on quit
     
 
 
 def unregister():
+    tsynth_jobs.scheduler.cancel_all()
+    if bpy.app.timers.is_registered(main_operators.tick_jobs):
+        bpy.app.timers.unregister(main_operators.tick_jobs)
+    main_operators.shutdown_loads()
+    tsynth_guides.shutdown()
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
 
@@ -87,6 +119,8 @@ def unregister():
     del bpy.types.Scene.tsynth_params
 
     tsynth_props.unregister_thumbs()
+    atexit.unregister(tsynth_props.save_metadata_cache)
+    tsynth_props.save_metadata_cache()
 
 
 
@@ -69,6 +69,15 @@ class TextureSynthPreferences(bpy.types.AddonPreferences):
     text_synth_path: bpy.props.StringProperty(name="Path to texture-synthesis.exe", description="", default="", subtype='FILE_PATH', update=check_ts_exist)
     category: bpy.props.StringProperty(name="Tab Category", description="Choose a name for the category of the panel", default="Texture Synthesis", update=update_panel)
     display_info: bpy.props.StringProperty(name="Info", description="", default="")
+    max_jobs: bpy.props.IntProperty(name="Max Parallel Jobs", description="How many texture-synthesis processes can run at once (eg. in Shift+Click folder batch). Each process is already multi-threaded", default=2, min=1, soft_max=os.cpu_count() or 8)
+    partition_cores: bpy.props.BoolProperty(name="Split Cores Between Jobs", description="Give every running texture-synthesis process its own cores (--threads, and CPU affinity on linux) instead of letting all of them use every core.\n"
+                                            "Few queued jobs run wide, many queued or small images run narrow", default=True)
+    ram_budget: bpy.props.IntProperty(name="RAM Budget (MB)", description="Start next texture-synthesis process only if estimated peak memory of it and of running ones fits in this budget. "
+                                      "Estimate comes from image sizes and k_neighs, corrected by memory measured in earlier runs.\n0 - 75% of physical memory", default=0, min=0)
+    job_timeout: bpy.props.IntProperty(name="Job Timeout (sec)", description="Kill texture-synthesis process if it runs longer than this many seconds. 0 - no limit", default=600, min=0)
+    use_result_cache: bpy.props.BoolProperty(name="Cache Results", description="Reuse previous output when input image, guides and all settings did not change, instead of running texture-synthesis again", default=True)
+    log_telemetry: bpy.props.BoolProperty(name="Log Runs", description="Append settings, run time, CPU time and peak memory of every texture-synthesis run to telemetry.jsonl in addon cache folder.\nSummary: python tsynth_telemetry.py <telemetry.jsonl>", default=True)
+    result_cache_size: bpy.props.IntProperty(name="Cache Size (MB)", description="Least recently used results are removed when cache gets bigger than this", default=1024, min=16)
 
     def draw(self, context):
         layout = self.layout
@@ -76,3 +85,13 @@ class TextureSynthPreferences(bpy.types.AddonPreferences):
         col.prop(self, "category", text="")
         col.prop(self, "text_synth_path", text="")
         col.label(text=self.display_info)
+        row = col.row(align=True)
+        row.prop(self, "max_jobs")
+        row.prop(self, "partition_cores")
+        row = col.row(align=True)
+        row.prop(self, "ram_budget")
+        row.prop(self, "job_timeout")
+        row = col.row(align=True)
+        row.prop(self, "use_result_cache")
+        row.prop(self, "result_cache_size")
+        col.prop(self, "log_telemetry")
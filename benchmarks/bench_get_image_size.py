@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark for get_image_size parsers. Runs without blender:
+
+    python benchmarks/bench_get_image_size.py                  # compare with baseline
+    python benchmarks/bench_get_image_size.py --save-baseline  # store new baseline
+    python benchmarks/bench_get_image_size.py --against HEAD~1 # speed of both versions, same process
+
+Synthetic fixtures (PNG, JPEG with big APPn segments, BMP, TIFF, GIF) of
+different sizes are generated in a temp dir. For each fixture it measures
+files probed per second (real files, get_image_metadata) and bytes / read
+calls per probe (get_image_metadata_from_bytesio on counting reader).
+
+Bytes and reads per probe are deterministic and have to match baseline
+exactly (or be lower) - that is the default gate. Throughput depends on
+machine, so it is only checked with --check-throughput, and then relative
+to reference probe (open, read header, close) timed in same process.
+--against runs same fixtures through other version of get_image_size.py
+(file or git revision) and prints speedup.
+"""
+import argparse
+import importlib.util
+import io
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(HERE, 'baseline_get_image_size.json')
+
+
+def load_get_image_size(file_path=os.path.join(HERE, '..', 'get_image_size.py'), name='get_image_size'):
+    # import module file directly - addon package __init__ needs bpy
+    spec = importlib.util.spec_from_file_location(name, file_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_other_version(version, tmp_dir):
+    ''' get_image_size from file path, or from git revision (eg. HEAD~1) of this repo '''
+    if os.path.isfile(version):
+        return load_get_image_size(version, 'get_image_size_other')
+    source = subprocess.check_output(['git', 'show', f'{version}:get_image_size.py'], cwd=os.path.join(HERE, '..'))
+    file_path = os.path.join(tmp_dir, 'get_image_size_other.py')
+    with open(file_path, 'wb') as f:
+        f.write(source)
+    return load_get_image_size(file_path, 'get_image_size_other')
+
+
+def png_file(width, height, padding):
+    def chunk(name, data):
+        return struct.pack('>L', len(data)) + name + data + struct.pack('>L', zlib.crc32(name + data) & 0xffffffff)
+    ihdr = struct.pack('>LLBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IDAT', b'\0' * padding) + chunk(b'IEND', b'')
+
+
+def jpeg_file(width, height, app_sizes, padding, sof=0xC0):
+    def segment(marker, payload):
+        return b'\xff' + struct.pack('>BH', marker, len(payload) + 2) + payload
+    data = b'\xff\xd8'
+    for i, app_size in enumerate(app_sizes):
+        data += segment(0xE0 + i % 16, b'\0' * app_size)
+    data += segment(0xDB, b'\0' * 65) + segment(0xC4, b'\0' * 28)
+    data += segment(sof, struct.pack('>BHHB', 8, height, width, 3) + b'\x01\x11\x00\x02\x11\x01\x03\x11\x01')
+    data += segment(0xDA, b'\0' * 10)
+    return data + b'\x12' * padding + b'\xff\xd9'
+
+
+def bmp_file(width, height, padding):
+    header = struct.pack('<2sLHHL', b'BM', 54 + padding, 0, 0, 54)
+    dib = struct.pack('<LiiHHLLiiLL', 40, width, -height, 1, 24, 0, padding, 2835, 2835, 0, 0)
+    return header + dib + b'\0' * padding
+
+
+def tiff_file(width, height, padding):
+    # IFD at end of file, after pixel data - common for TIFFs written by image editors
+    ifd_offset = 8 + padding
+    entries = [(256, 3, 1, width), (257, 3, 1, height), (258, 3, 1, 8), (259, 3, 1, 1), (262, 3, 1, 1)]
+    ifd = struct.pack('<H', len(entries))
+    for tag, tag_type, count, value in entries:
+        ifd += struct.pack('<HHLHH', tag, tag_type, count, value, 0)
+    return b'II*\0' + struct.pack('<L', ifd_offset) + b'\0' * padding + ifd + b'\0\0\0\0'
+
+
+def gif_file(width, height, padding):
+    return b'GIF89a' + struct.pack('<HHBBB', width, height, 0, 0, 0) + b'\0' * padding + b';'
+
+
+FIXTURES = [
+    ('png_small', lambda: png_file(256, 256, 1024)),
+    ('png_large', lambda: png_file(8192, 8192, 4 * 1024 * 1024)),
+    ('jpeg_plain', lambda: jpeg_file(1024, 768, [16], 64 * 1024)),
+    ('jpeg_exif_icc', lambda: jpeg_file(4096, 4096, [16, 65000, 65000, 65000, 30000], 4 * 1024 * 1024)),
+    ('jpeg_many_app', lambda: jpeg_file(8192, 8192, [2000] * 64, 1024 * 1024)),
+    ('jpeg_progressive', lambda: jpeg_file(2048, 2048, [16, 20000], 1024 * 1024, sof=0xC2)),
+    ('bmp', lambda: bmp_file(2048, 2048, 2048 * 2048 * 3)),
+    ('tiff_ifd_at_end', lambda: tiff_file(2048, 2048, 2 * 1024 * 1024)),
+    ('gif', lambda: gif_file(512, 512, 64 * 1024)),
+]
+
+
+class CountingReader(io.RawIOBase):
+    ''' Wraps file object and counts read calls and bytes returned '''
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+        self.reads = 0
+
+    def read(self, n=-1):
+        data = self.raw.read(n)
+        self.reads += 1
+        self.bytes_read += len(data)
+        return data
+
+    def seek(self, offset, whence=0):
+        return self.raw.seek(offset, whence)
+
+    def tell(self):
+        return self.raw.tell()
+
+
+def probes_per_sec(probe, path, min_time):
+    count = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        for _ in range(50):
+            probe(path)
+        count += 50
+        elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+def reference_probe(path):
+    ''' What every probe costs at least - scales with machine, not with parser '''
+    os.path.getsize(path)
+    with io.open(path, 'rb') as f:
+        f.read(26)
+
+
+def measure(gis, path, min_time):
+    size = os.path.getsize(path)
+    with open(path, 'rb', buffering=0) as f:
+        reader = CountingReader(f)
+        img = gis.get_image_metadata_from_bytesio(reader, size, path)
+    files_per_sec = probes_per_sec(gis.get_image_metadata, path, min_time)
+    reference_per_sec = probes_per_sec(reference_probe, path, min_time / 2)
+    return {
+        'size': [img.width, img.height],
+        'file_size': size,
+        'bytes_per_probe': reader.bytes_read,
+        'reads_per_probe': reader.reads,
+        'files_per_sec': round(files_per_sec, 1),
+        'relative_speed': round(files_per_sec / reference_per_sec, 4),  # comparable between machines
+    }
+
+
+def compare(results, baseline, tolerance, check_throughput=False):
+    failures = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['size'] != base['size']:
+            failures.append(f'{name}: parsed size {result["size"]} != baseline {base["size"]}')
+        for key in ('bytes_per_probe', 'reads_per_probe'):
+            if result[key] > base[key]:
+                failures.append(f'{name}: {key} {result[key]} > baseline {base[key]}')
+        if check_throughput and 'relative_speed' in base and result['relative_speed'] < base['relative_speed'] * (1 - tolerance):
+            failures.append(f'{name}: relative_speed {result["relative_speed"]} < baseline {base["relative_speed"]} - {tolerance:.0%}')
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark get_image_size parsers')
+    parser.add_argument('--save-baseline', action='store_true', help='write results as new baseline')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--check-throughput', action='store_true', help='also fail when speed relative to reference probe drops below baseline')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='allowed relative speed drop with --check-throughput, fraction of baseline (default: 0.3)')
+    parser.add_argument('--against', metavar='VERSION', help='get_image_size.py file or git revision to compare speed with')
+    parser.add_argument('--min-time', type=float, default=0.3, help='seconds spent probing each fixture')
+    args = parser.parse_args(argv)
+
+    gis = load_get_image_size()
+    tmp_dir = tempfile.mkdtemp(prefix='bench_get_image_size')
+    results = {}
+    other_results = {}
+    try:
+        other = load_other_version(args.against, tmp_dir) if args.against else None
+        for name, make in FIXTURES:
+            path = os.path.join(tmp_dir, name)
+            with open(path, 'wb') as f:
+                f.write(make())
+            results[name] = measure(gis, path, args.min_time)
+            if other is not None:
+                other_results[name] = measure(other, path, args.min_time)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    print(f'{"fixture":<18}{"size":>12}{"file KB":>10}{"bytes/probe":>13}{"reads/probe":>13}{"files/sec":>12}{"relative":>10}'
+          + (f'{"other f/s":>12}{"speedup":>9}' if other_results else ''))
+    for name, r in results.items():
+        line = f'{name:<18}{"%dx%d" % tuple(r["size"]):>12}{r["file_size"] // 1024:>10}{r["bytes_per_probe"]:>13}{r["reads_per_probe"]:>13}{r["files_per_sec"]:>12}{r["relative_speed"]:>10}'
+        if name in other_results:
+            line += f'{other_results[name]["files_per_sec"]:>12}{r["files_per_sec"] / other_results[name]["files_per_sec"]:>8.2f}x'
+        print(line)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+
+    if not os.path.isfile(args.baseline):
+        print('No baseline - run with --save-baseline first')
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    failures = compare(results, baseline, args.tolerance, args.check_throughput)
+    for failure in failures:
+        print('REGRESSION', failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -21,6 +21,7 @@ import json
 import os
 import io
 import struct
+import threading
 
 FILE_UNKNOWN = "Sorry, don't know how to get size for this file."
 
@@ -36,6 +37,18 @@ ICO = types['ICO'] = 'ICO'
 JPEG = types['JPEG'] = 'JPEG'
 PNG = types['PNG'] = 'PNG'
 TIFF = types['TIFF'] = 'TIFF'
+WEBP = types['WEBP'] = 'WEBP'
+TGA = types['TGA'] = 'TGA'
+EXR = types['EXR'] = 'EXR'
+HDR = types['HDR'] = 'HDR'
+PSD = types['PSD'] = 'PSD'
+
+# file extensions of formats above
+IMAGE_EXTENSIONS = ('.bmp', '.gif', '.ico', '.jpg', '.jpeg', '.png', '.tif',
+                    '.tiff', '.webp', '.tga', '.exr', '.hdr', '.psd')
+
+# headers of these are read in one go - they are small, but not fixed size
+MAX_HEADER_SIZE = 64 * 1024
 
 image_fields = ['path', 'type', 'file_size', 'width', 'height']
 
@@ -104,6 +117,75 @@ def get_image_metadata(file_path):
         return get_image_metadata_from_bytesio(input, size, file_path)
 
 
+# SOF0..SOF15 - baseline, extended, progressive, lossless, arithmetic.
+# 0xC4 (DHT), 0xC8 (JPG extension) and 0xCC (DAC) share the range but are
+# not frame headers
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - frozenset((0xC4, 0xC8, 0xCC))
+# markers without length field: TEM, RST0..RST7, SOI
+JPEG_STANDALONE_MARKERS = frozenset([0x01] + list(range(0xD0, 0xD9)))
+# first read covers SOI, JFIF APP0, DQT, DHT and SOF of plain files. Past it
+# every segment header is read on its own - never segment contents
+JPEG_FIRST_BLOCK = 512
+JPEG_HEADER_SIZE = 9  # marker(2), length(2), SOF precision(1), height(2), width(2)
+
+
+def _get_jpeg_size(input):
+    """
+    Return (width, height) from first SOFn segment. Segments before it are
+    skipped using their length fields.
+
+    Args:
+        input (io.IOBase): io object support read & seek
+    """
+    read, seek = input.read, input.seek
+    seek(0)
+    buf = read(JPEG_FIRST_BLOCK)
+    buf_start, buf_len = 0, len(buf)
+    pos = 2  # skip SOI
+    while True:
+        i = pos - buf_start
+        if i + JPEG_HEADER_SIZE > buf_len:  # jumped past buffer
+            seek(pos)
+            buf = read(JPEG_HEADER_SIZE)
+            buf_start, buf_len, i = pos, len(buf), 0
+            if buf_len < 4:
+                raise struct.error("unexpected end of JPEG data")
+        if buf[i] != 0xFF or buf[i + 1] == 0xFF:  # garbage or fill bytes
+            pos += 1
+            continue
+        marker = buf[i + 1]
+        if marker in JPEG_SOF_MARKERS:
+            if i + JPEG_HEADER_SIZE > buf_len:
+                raise struct.error("unexpected end of JPEG data")
+            h, w = struct.unpack_from(">HH", buf, i + 5)
+            return int(w), int(h)
+        if marker == 0xDA or marker == 0xD9:  # SOS or EOI - no frame header
+            raise UnknownImageFormat("No SOF marker found in JPEG.")
+        if marker in JPEG_STANDALONE_MARKERS:
+            pos += 2
+        else:
+            pos += 2 + (buf[i + 2] << 8 | buf[i + 3])
+
+
+def _is_tga(input, data, size, file_path):
+    """
+    TGA header fields must be valid, and file must either end with TGA 2.0
+    footer or have .tga extension - random data is not reported as TGA
+    """
+    id_length, color_map_type, image_type = struct.unpack("<BBB", data[:3])
+    pixel_depth = ord(data[16:17])
+    if color_map_type not in (0, 1) or \
+            image_type not in (1, 2, 3, 9, 10, 11) or \
+            pixel_depth not in (8, 15, 16, 24, 32):
+        return False
+    if file_path is not None and file_path.lower().endswith('.tga'):
+        return True
+    if size < 44:
+        return False
+    input.seek(size - 18)
+    return input.read(18) == b'TRUEVISION-XFILE.\0'
+
+
 def get_image_metadata_from_bytesio(input, size, file_path=None):
     """
     Return an `Image` object for a given img file content - no external
@@ -144,29 +226,14 @@ def get_image_metadata_from_bytesio(input, size, file_path=None):
     elif (size >= 2) and data.startswith(b'\377\330'):
         # JPEG
         imgtype = JPEG
-        input.seek(0)
-        input.read(2)
-        b = input.read(1)
         try:
-            while (b and ord(b) != 0xDA):
-                while (ord(b) != 0xFF):
-                    b = input.read(1)
-                while (ord(b) == 0xFF):
-                    b = input.read(1)
-                if (ord(b) >= 0xC0 and ord(b) <= 0xC3):
-                    input.read(3)
-                    h, w = struct.unpack(">HH", input.read(4))
-                    break
-                else:
-                    input.read(
-                        int(struct.unpack(">H", input.read(2))[0]) - 2)
-                b = input.read(1)
-            width = int(w)
-            height = int(h)
+            width, height = _get_jpeg_size(input)
         except struct.error:
             raise UnknownImageFormat("StructError" + msg)
         except ValueError:
             raise UnknownImageFormat("ValueError" + msg)
+        except UnknownImageFormat:
+            raise
         except Exception as e:
             raise UnknownImageFormat(e.__class__.__name__ + msg)
     elif (size >= 26) and data.startswith(b'BM'):
@@ -245,25 +312,94 @@ def get_image_metadata_from_bytesio(input, size, file_path=None):
                     break
         except Exception as e:
             raise UnknownImageFormat(str(e))
-    elif size >= 2:
-            # see http://en.wikipedia.org/wiki/ICO_(file_format)
-        imgtype = 'ICO'
+    elif (size >= 30) and data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        # WebP - https://developers.google.com/speed/webp/docs/riff_container
+        imgtype = WEBP
+        input.seek(0)
+        data = input.read(30)
+        chunk = data[12:16]
+        if chunk == b'VP8 ':
+            # lossy: 3 byte frame tag, 3 byte start code, 14 bit dimensions
+            if data[23:26] != b'\x9d\x01\x2a':
+                raise UnknownImageFormat("Bad VP8 start code in WebP.")
+            w, h = struct.unpack("<HH", data[26:30])
+            width = int(w) & 0x3fff
+            height = int(h) & 0x3fff
+        elif chunk == b'VP8L':
+            # lossless: signature byte, then 14 bit width-1, height-1
+            if data[20:21] != b'\x2f':
+                raise UnknownImageFormat("Bad VP8L signature in WebP.")
+            bits = struct.unpack("<I", data[21:25])[0]
+            width = (bits & 0x3fff) + 1
+            height = ((bits >> 14) & 0x3fff) + 1
+        elif chunk == b'VP8X':
+            # extended: 4 byte flags, then 24 bit canvas width-1, height-1
+            width = struct.unpack("<I", data[24:27] + b'\0')[0] + 1
+            height = struct.unpack("<I", data[27:30] + b'\0')[0] + 1
+        else:
+            raise UnknownImageFormat("Unknown WebP chunk: %r" % chunk)
+    elif (size >= 26) and data[:4] == b'8BPS' and data[4:6] in (b'\0\1',
+                                                                 b'\0\2'):
+        # PSD / PSB: signature, version, 6 reserved, channels, height, width
+        imgtype = PSD
+        h, w = struct.unpack(">LL", data[14:22])
+        width = int(w)
+        height = int(h)
+    elif (size >= 8) and data[:4] == b'\x76\x2f\x31\x01':
+        # OpenEXR - header is list of (name, type, size, value) attributes
+        imgtype = EXR
+        input.seek(8)
+        header = input.read(MAX_HEADER_SIZE)
+        pos = 0
+        try:
+            while True:
+                name_end = header.index(b'\0', pos)
+                if name_end == pos:  # empty name ends header
+                    raise UnknownImageFormat("No dataWindow in EXR header.")
+                name = header[pos:name_end]
+                type_end = header.index(b'\0', name_end + 1)
+                attr_size = struct.unpack(
+                    "<i", header[type_end + 1:type_end + 5])[0]
+                pos = type_end + 5
+                if name == b'dataWindow':
+                    x_min, y_min, x_max, y_max = struct.unpack(
+                        "<iiii", header[pos:pos + 16])
+                    width = x_max - x_min + 1
+                    height = y_max - y_min + 1
+                    break
+                pos += attr_size
+        except (ValueError, struct.error):
+            raise UnknownImageFormat("Truncated EXR header.")
+    elif (size >= 11) and data.startswith((b'#?RADIANCE', b'#?RGBE')):
+        # Radiance HDR - text header, empty line, then eg. '-Y 512 +X 768'
+        imgtype = HDR
         input.seek(0)
-        reserved = input.read(2)
-        if 0 != struct.unpack("<H", reserved)[0]:
-            raise UnknownImageFormat(FILE_UNKNOWN)
-        format = input.read(2)
-        assert 1 == struct.unpack("<H", format)[0]
-        num = input.read(2)
-        num = struct.unpack("<H", num)[0]
+        header = input.read(MAX_HEADER_SIZE)
+        try:
+            resolution = header.split(b'\n\n', 1)[1].split(b'\n', 1)[0]
+            axis1, n1, axis2, n2 = resolution.split()
+            if axis1[1:] == b'Y':
+                height, width = int(n1), int(n2)
+            else:
+                width, height = int(n1), int(n2)
+        except (IndexError, ValueError):
+            raise UnknownImageFormat("Bad resolution line in HDR.")
+    elif (size >= 6) and data[:4] == b'\0\0\1\0':
+        # see http://en.wikipedia.org/wiki/ICO_(file_format)
+        imgtype = 'ICO'
+        num = struct.unpack("<H", data[4:6])[0]
         if num > 1:
             import warnings
             warnings.warn("ICO File contains more than one image")
         # http://msdn.microsoft.com/en-us/library/ms997538.aspx
-        w = input.read(1)
-        h = input.read(1)
-        width = ord(w)
-        height = ord(h)
+        width = ord(data[6:7])
+        height = ord(data[7:8])
+    elif (size >= 18) and _is_tga(input, data, size, file_path):
+        # TGA has no magic number - see _is_tga
+        imgtype = TGA
+        w, h = struct.unpack("<HH", data[12:16])
+        width = int(w)
+        height = int(h)
     else:
         raise UnknownImageFormat(FILE_UNKNOWN)
 
@@ -274,6 +410,186 @@ def get_image_metadata_from_bytesio(input, size, file_path=None):
                  height=height)
 
 
+class ImageMetadataCache(object):
+    """
+    Bounded LRU cache of `Image` objects. Entry is valid only while
+    file (path, mtime_ns, size) stays the same, so changed files are
+    probed again automatically.
+
+    Args:
+        max_entries (int): least recently used entries above this are dropped
+    """
+
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self.dirty = False
+        # abspath -> (mtime_ns, file_size, type, width, height)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()  # get_image_metadata_many probes from many threads
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self.dirty = True
+
+    def get_image_metadata(self, file_path):
+        """
+        Same as `get_image_metadata`, but file header is read only on
+        cache miss.
+
+        Args:
+            file_path (str): path to an image file
+
+        Returns:
+            Image: (path, type, file_size, width, height)
+        """
+        stat = os.stat(file_path)
+        key = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns,
+                                                   stat.st_size):
+                self._entries.move_to_end(key)
+                return Image(path=file_path, type=entry[2],
+                             file_size=entry[1], width=entry[3],
+                             height=entry[4])
+
+        with io.open(file_path, "rb") as input:
+            img = get_image_metadata_from_bytesio(input, stat.st_size,
+                                                  file_path)
+        with self._lock:
+            self._entries[key] = (stat.st_mtime_ns, stat.st_size, img.type,
+                                  img.width, img.height)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.dirty = True
+        return img
+
+    def get_image_size(self, file_path):
+        img = self.get_image_metadata(file_path)
+        return (img.width, img.height)
+
+    def load(self, cache_file):
+        """
+        Read entries saved by `save`. Missing or broken cache file is
+        ignored.
+
+        Args:
+            cache_file (str): path to json file
+        """
+        try:
+            with io.open(cache_file, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(rows, list):
+            return
+        for row in rows[-self.max_entries:]:
+            try:
+                path, mtime_ns, file_size, imgtype, width, height = row
+            except (TypeError, ValueError):
+                continue
+            if not isinstance(path, str):
+                continue
+            self._entries[path] = (mtime_ns, file_size, imgtype, width,
+                                   height)
+        self.dirty = False
+
+    def save(self, cache_file):
+        """
+        Write entries to json file (least recently used first). Does
+        nothing if cache did not change since load or last save.
+
+        Args:
+            cache_file (str): path to json file
+        """
+        if not self.dirty:
+            return
+        with self._lock:
+            rows = [[path] + list(entry)
+                    for path, entry in self._entries.items()]
+        tmp_file = cache_file + ".tmp"
+        with io.open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+        os.replace(tmp_file, cache_file)
+        self.dirty = False
+
+
+metadata_cache = ImageMetadataCache()
+
+
+def get_image_size_cached(file_path):
+    """
+    Return (width, height) for a given img file, using module level
+    `metadata_cache`
+    """
+    return metadata_cache.get_image_size(file_path)
+
+
+ProbeResult = collections.namedtuple('ProbeResult', ['path', 'image', 'error'])
+
+
+def get_image_metadata_many(paths, max_workers=8, cache=None):
+    """
+    Probe many image files at once on a thread pool (time is spent
+    waiting for open/seek/read, so threads overlap well even with GIL).
+
+    Results are yielded as soon as each file is done - not in input
+    order. Errors do not stop the iteration, they are reported in
+    `ProbeResult.error` (`image` is None then).
+
+    Args:
+        paths (iterable): image file paths
+        max_workers (int): number of threads
+        cache (ImageMetadataCache): optional - use and fill this cache
+
+    Yields:
+        ProbeResult: (path, image, error)
+    """
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    probe = cache.get_image_metadata if cache is not None \
+        else get_image_metadata
+    paths = iter(paths)
+    # submit only a window of paths, so tens of thousands of files do not
+    # create tens of thousands of futures up front
+    window = max(1, max_workers) * 4
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pending = {}
+        while True:
+            for path in paths:
+                pending[executor.submit(probe, path)] = path
+                if len(pending) >= window:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    yield ProbeResult(path, future.result(), None)
+                else:
+                    yield ProbeResult(path, None, error)
+
+
+def iter_image_paths(dir_path, recursive=False):
+    """
+    Yield paths of files in directory (all files - unknown formats are
+    reported by the probe, not guessed from extension)
+    """
+    for entry in os.scandir(dir_path):
+        if entry.is_dir():
+            if recursive:
+                for path in iter_image_paths(entry.path, recursive):
+                    yield path
+        elif entry.is_file():
+            yield entry.path
+
+
 import unittest
 
 
@@ -336,10 +652,139 @@ class Test_get_image_size(unittest.TestCase):
                          (img['width'],
                           img['height']))
 
+    def test_metadata_cache(self):
+        import shutil
+        import tempfile
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            p = os.path.join(tmp_dir, 'cached.png')
+            with io.open(p, 'wb') as fp:
+                fp.write(_png_header(10, 20))
+            cache = ImageMetadataCache(max_entries=1)
+            self.assertEqual(cache.get_image_size(p), (10, 20))
+            os.utime(p, ns=(0, 0))
+            with io.open(p, 'wb') as fp:  # different size -> new entry
+                fp.write(_png_header(30, 40) + b'\0')
+            self.assertEqual(cache.get_image_size(p), (30, 40))
+            cache_file = os.path.join(tmp_dir, 'cache.json')
+            cache.save(cache_file)
+            loaded = ImageMetadataCache()
+            loaded.load(cache_file)
+            self.assertEqual(len(loaded), 1)
+            self.assertEqual(loaded.get_image_size(p), (30, 40))
+            self.assertFalse(loaded.dirty)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_metadata_cache__broken_file_ignored(self):
+        import shutil
+        import tempfile
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            cache_file = os.path.join(tmp_dir, 'cache.json')
+            for content in ('{}', '7', 'null', '[[["a"], 0, 0, "PNG", 1, 1], "x"]', '[{'):
+                with io.open(cache_file, 'w', encoding='utf-8') as fp:
+                    fp.write(content)
+                cache = ImageMetadataCache()
+                cache.load(cache_file)
+                self.assertEqual(len(cache), 0)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_get_jpeg_size__large_app_segments_and_sofn(self):
+        for sof in sorted(JPEG_SOF_MARKERS):
+            b = _jpeg_header(640, 480, sof, app_sizes=(14, 65000, 65000))
+            output = get_image_metadata_from_bytesio(io.BytesIO(b), len(b))
+            self.assertEqual((output.type, output.width, output.height),
+                             (JPEG, 640, 480))
+
+    def test_get_jpeg_size__no_sof_UnknownImageFormat(self):
+        b = b'\xff\xd8' + _jpeg_segment(0xE0, b'\0' * 14) + b'\xff\xd9'
+        with self.assertRaises(UnknownImageFormat):
+            get_image_metadata_from_bytesio(io.BytesIO(b), len(b))
+
+    def test_get_image_metadata_many(self):
+        import shutil
+        import tempfile
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            paths = []
+            for i in range(20):
+                p = os.path.join(tmp_dir, '%d.png' % i)
+                with io.open(p, 'wb') as fp:
+                    fp.write(_png_header(i + 1, 2 * i + 1))
+                paths.append(p)
+            bad = os.path.join(tmp_dir, 'bad.txt')
+            with io.open(bad, 'wb') as fp:
+                fp.write(b'not an image')
+            missing = os.path.join(tmp_dir, 'missing.png')
+            results = {r.path: r for r in get_image_metadata_many(
+                paths + [bad, missing], max_workers=3)}
+            self.assertEqual(len(results), 22)
+            for i, p in enumerate(paths):
+                self.assertIsNone(results[p].error)
+                self.assertEqual((results[p].image.width,
+                                  results[p].image.height), (i + 1, 2 * i + 1))
+            self.assertIsInstance(results[bad].error, UnknownImageFormat)
+            self.assertIsInstance(results[missing].error, OSError)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_get_image_metadata__header_only_formats(self):
+        def attr(name, attr_type, value):
+            return (name + b'\0' + attr_type + b'\0' +
+                    struct.pack('<i', len(value)) + value)
+        vp8l_bits = 399 | (299 << 14)
+        headers = [
+            (WEBP, b'RIFF\0\0\0\0WEBPVP8 \0\0\0\0\x10\x02\x00\x9d\x01\x2a' +
+             struct.pack('<HH', 400, 300)),
+            (WEBP, b'RIFF\0\0\0\0WEBPVP8L\0\0\0\0\x2f' +
+             struct.pack('<I', vp8l_bits) + b'\0' * 5),
+            (WEBP, b'RIFF\0\0\0\0WEBPVP8X\0\0\0\0\0\0\0\0' +
+             struct.pack('<I', 399)[:3] + struct.pack('<I', 299)[:3]),
+            (PSD, b'8BPS\0\1' + b'\0' * 6 + struct.pack('>HLL', 3, 300, 400) +
+             b'\0\x08\0\x03'),
+            (EXR, b'\x76\x2f\x31\x01\x02\0\0\0' +
+             attr(b'compression', b'compression', b'\0') +
+             attr(b'dataWindow', b'box2i',
+                  struct.pack('<iiii', 10, 10, 409, 309)) + b'\0'),
+            (HDR, b'#?RADIANCE\nFORMAT=32-bit_rle_rgbe\n\n-Y 300 +X 400\n'),
+            (TGA, struct.pack('<BBB5sHHHHBB', 0, 0, 2, b'', 0, 0, 400, 300,
+                              24, 0) + b'\0' * 8 + b'TRUEVISION-XFILE.\0'),
+        ]
+        for imgtype, b in headers:
+            output = get_image_metadata_from_bytesio(io.BytesIO(b), len(b))
+            self.assertEqual((output.type, output.width, output.height),
+                             (imgtype, 400, 300))
+
+    def test_get_image_metadata_from_bytesio__unknown(self):
+        b = b'plain text, neither ICO nor TGA'
+        with self.assertRaises(UnknownImageFormat):
+            get_image_metadata_from_bytesio(io.BytesIO(b), len(b))
+
     def tearDown(self):
         pass
 
 
+def _jpeg_segment(marker, payload):
+    return b'\xff' + struct.pack('>BH', marker, len(payload) + 2) + payload
+
+
+def _jpeg_header(width, height, sof=0xC0, app_sizes=()):
+    b = b'\xff\xd8'
+    for n, app_size in enumerate(app_sizes):
+        b += _jpeg_segment(0xE0 + n, b'\0' * app_size)
+    b += _jpeg_segment(0xC4, b'\0' * 30)  # DHT - not a SOF
+    b += _jpeg_segment(sof, struct.pack('>BHHB', 8, height, width, 1) +
+                       b'\x01\x11\x00')
+    return b + _jpeg_segment(0xDA, b'\0' * 8)
+
+
+def _png_header(width, height):
+    return (b'\211PNG\r\n\032\n' + struct.pack('>L', 13) + b'IHDR' +
+            struct.pack('>LLBBBBB', width, height, 8, 6, 0, 0, 0))
+
+
 def main(argv=None):
     """
     Print image metadata fields for the given file path.
@@ -354,9 +799,10 @@ def main(argv=None):
     import sys
 
     prs = optparse.OptionParser(
-        usage="%prog [-v|--verbose] [--json|--json-indent] <path0> [<pathN>]",
-        description="Print metadata for the given image paths "
-                    "(without image library bindings).")
+        usage="%prog [-v|--verbose] [--json|--json-indent] [-r] [-j N] "
+              "<path0> [<pathN>]",
+        description="Print metadata for the given image paths or "
+                    "directories (without image library bindings).")
 
     prs.add_option('--json',
                    dest='json',
@@ -374,6 +820,15 @@ def main(argv=None):
     prs.add_option('-t', '--test',
                    dest='run_tests',
                    action='store_true',)
+    prs.add_option('-r', '--recursive',
+                   dest='recursive',
+                   action='store_true',
+                   help="descend into subdirectories of directory paths")
+    prs.add_option('-j', '--jobs',
+                   dest='jobs',
+                   type='int',
+                   default=8,
+                   help="number of files probed in parallel (default: 8)")
 
     argv = list(argv) if argv is not None else sys.argv[1:]
     (opts, args) = prs.parse_args(args=argv)
@@ -411,20 +866,21 @@ def main(argv=None):
         print('')
         prs.error("You must specify one or more paths to image files")
 
+    def expand_paths():
+        for path_arg in args:
+            if os.path.isdir(path_arg):
+                for path in iter_image_paths(path_arg, opts.recursive):
+                    yield path
+            else:
+                yield path_arg
+
     errors = []
-    for path_arg in args:
-        try:
-            img = get_image_metadata(path_arg)
-            print(output_func(img))
-        except KeyboardInterrupt:
-            raise
-        except OSError as e:
-            log.error((path_arg, e))
-            errors.append((path_arg, e))
-        except Exception as e:
-            log.exception(e)
-            errors.append((path_arg, e))
-            pass
+    for result in get_image_metadata_many(expand_paths(), opts.jobs):
+        if result.error is None:
+            print(output_func(result.image))
+        else:
+            log.error((result.path, result.error))
+            errors.append((result.path, result.error))
     if len(errors):
         import pprint
         print("ERRORS", file=sys.stderr)
@@ -18,46 +18,398 @@ Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simp
 '''
 
 import bpy
-from .utils import get_addon_preferences
+from .utils import get_addon_preferences, redraw_image_editors, get_cache_dir, show_in_image_editor
 import os
-import time
 from pathlib import Path
 from mathutils import Vector
 import bpy.utils.previews
 from tempfile import gettempdir
-import functools
-import subprocess
 from . import tsynth_props
+from . import tsynth_jobs
+from . import tsynth_cache
+from . import tsynth_telemetry
+from . import get_image_size
+from . import tsynth_sheet
+from . import tsynth_png
+from . import tsynth_guides
+from . import tsynth_command
+from . import tsynth_queue
+from . import tsynth_tiles
+from . import tsynth_memory
+import numpy as np
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+
+RESULT_CACHE = None
+CACHE_EXECUTOR = None
+MEMORY_HISTORY_LOADED = False
+LOAD_EXECUTOR = None
+PENDING_LOADS = {}  # img_path -> (image name, show, Future of decoded pixels)
+TILE_EXECUTOR = None
+PENDING_CALLBACKS = []  # (Future, callback(future)) - run from tick_jobs, on main thread, once future is done
+PIXEL_POOL = tsynth_png.BufferPool()
+
+
+def find_image(img_path):
+    img_path = os.path.normcase(os.path.abspath(img_path))
+    for img in bpy.data.images:
+        if img.source == 'FILE' and os.path.normcase(os.path.abspath(bpy.path.abspath(img.filepath))) == img_path:
+            return img
+    return None
+
+
+def load_image(img_path, show=False):
+    ''' Image already loaded with pixels in memory gets new pixels decoded on worker thread - see apply_decoded_images().
+    Otherwise image is loaded (or reloaded) by blender, which decodes it on main thread, once it is drawn '''
+    global LOAD_EXECUTOR
+    img = find_image(img_path)
+    if img is not None and img.has_data:
+        if LOAD_EXECUTOR is None:
+            LOAD_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='tsynth_load')
+        future = LOAD_EXECUTOR.submit(tsynth_png.decode_png, img_path, PIXEL_POOL)
+        PENDING_LOADS[img_path] = (img.name, show, future)  # older pending decode of same file is dropped
+        start_jobs_timer()
+        return img
+    return load_image_blender(img_path, show)
+
+
+def load_image_blender(img_path, show=False):
+    existing_imgs = bpy.data.images[:]
+    x = bpy.data.images.load(img_path, check_existing=True)
+    if x in existing_imgs:
+        x.reload()
+    if show:
+        show_in_image_editor(x)
+    return x
+
+
+def apply_decoded_images():
+    ''' Main thread part of load_image() - one foreach_set into existing datablock, no decoding '''
+    for img_path, (img_name, show, future) in list(PENDING_LOADS.items()):
+        if not future.done():
+            continue
+        del PENDING_LOADS[img_path]
+        img = bpy.data.images.get(img_name)
+        try:
+            pixels = future.result()
+        except (OSError, ValueError, zlib.error) as e:
+            print(f'Decoding {img_path} on worker thread failed ({e}), loading it with blender')
+            load_image_blender(img_path, show)
+            continue
+        if img is None:  # removed in the meantime
+            PIXEL_POOL.release(pixels)
+            load_image_blender(img_path, show)
+            continue
+        height, width = pixels.shape[:2]
+        if tuple(img.size) != (width, height):
+            img.scale(width, height)
+        img.pixels.foreach_set(pixels.ravel())
+        img.update()
+        PIXEL_POOL.release(pixels)
+        if show:
+            show_in_image_editor(img)
+
+
+def defer_to_main(future, callback):
+    PENDING_CALLBACKS.append((future, callback))
+    start_jobs_timer()
+
+
+def run_deferred_callbacks():
+    for item in PENDING_CALLBACKS[:]:
+        future, callback = item
+        if future.done():
+            PENDING_CALLBACKS.remove(item)
+            try:
+                callback(future)
+            except Exception as e:
+                print(f'Error in callback of background task: {e}')
+
+
+def shutdown_loads():
+    global LOAD_EXECUTOR, TILE_EXECUTOR
+    for _, _, future in PENDING_LOADS.values():
+        future.cancel()
+    PENDING_LOADS.clear()
+    PENDING_CALLBACKS.clear()
+    if LOAD_EXECUTOR is not None:
+        LOAD_EXECUTOR.shutdown(wait=False)
+        LOAD_EXECUTOR = None
+    if TILE_EXECUTOR is not None:
+        TILE_EXECUTOR.shutdown(wait=False)
+        TILE_EXECUTOR = None
+    shutdown_cache_lookups()
+
+
+def load_generated_image(job, show=False):
+    if job.status not in tsynth_jobs.SUCCEEDED:
+        print(f'{job.out_path} was not generated ({job.status}). Skipping loading generated file')
+        return
+    load_image(job.out_path, show)
+
+
+def scale_size(size, percent):
+    ''' '512x256', 25 -> '128x64'. Not below 16 px - smaller would not leave room for neighbours '''
+    width, height = (int(v) for v in size.split('x'))
+    return f'{max(16, int(width * percent / 100))}x{max(16, int(height * percent / 100))}'
 
-LAST_EDIT_TIME = None
-COUNT_TIME = 0
 
-def check_file_was_generated(out_path):
-    global LAST_EDIT_TIME, COUNT_TIME
-    current_time = time.time()
-    if current_time - COUNT_TIME > 30:  # we waited 20 max seconds. Else quit timer
-        COUNT_TIME = 0
-        print(f'Waited 30 sec for {out_path} to be generated, no output detected. Time passed: {current_time - COUNT_TIME:.1} sec\nSkipping loading generated file')
+def get_sizes(tsynth_params):
+    ''' (in_size, out_size) strings like '512x512', from presets or from image size and percent '''
+    in_size = f"{tsynth_params.in_size_preset_x}x{tsynth_params.in_size_preset_y}" if tsynth_params.in_size_from_preset else f"{int(tsynth_params.in_size_x*tsynth_params.in_size_percent/100)}x{int(tsynth_params.in_size_y*tsynth_params.in_size_percent/100)}"
+    out_size = f"{tsynth_params.out_size_preset_x}x{tsynth_params.out_size_preset_y}" if tsynth_params.out_size_from_preset else f"{int(tsynth_params.out_size_x*tsynth_params.out_size_percent/100)}x{int(tsynth_params.out_size_y*tsynth_params.out_size_percent/100)}"
+    return in_size, out_size
+
+
+def build_command(tsynth_params, out_path, in_size, out_size, input_img_path):
+    ''' texture-synthesis command line for current settings. Changed guide images are saved to guides cache. Raises ValueError if guide is missing '''
+    gen_type = tsynth_params.gen_type
+    if gen_type == 'multi-generate':
+        inputs = [os.path.join(tsynth_params.input_images_dir, img_info.image_name) for img_info in tsynth_params.selected_imgs]
+    else:
+        inputs = [input_img_path]
+    from_guide = to_guide = None
+    if gen_type == 'guided-synthesis':
+        if not tsynth_params.from_guide or not tsynth_params.from_guide.has_data:
+            raise ValueError('From guide image is empty. Canceling')
+        from_guide = tsynth_guides.export_guide(tsynth_params.from_guide)
+    if gen_type in ('guided-synthesis', 'inpaint'):
+        if not tsynth_params.to_guide or not tsynth_params.to_guide.has_data:
+            raise ValueError('To guide image is empty. Canceling')
+    if gen_type in ('guided-synthesis', 'transfer-style', 'inpaint') and tsynth_params.to_guide:
+        to_guide = tsynth_guides.export_guide(tsynth_params.to_guide)
+    return tsynth_command.build_command(get_addon_preferences().text_synth_path, tsynth_props.settings_to_dict(tsynth_params), out_path,
+                                        inputs, in_size, out_size, from_guide, to_guide)
+
+
+def with_options(command, options):
+    ''' Copy of command with values of given options replaced, eg. {'--seed': '3'} '''
+    command = command[:]
+    for option, value in options.items():
+        command[command.index(option) + 1] = value
+    return command
+
+
+def with_sizes(command, in_size, out_size):
+    return with_options(command, {'--in-size': in_size, '--out-size': out_size})
+
+
+def get_result_cache():
+    global RESULT_CACHE
+    addon_prefs = get_addon_preferences()
+    if not addon_prefs.use_result_cache:
+        return None
+    if RESULT_CACHE is None:
+        RESULT_CACHE = tsynth_cache.ResultCache(get_cache_dir('results'), 0)
+    RESULT_CACHE.max_size = addon_prefs.result_cache_size * 1024 * 1024
+    return RESULT_CACHE
+
+
+def get_job_meta(tsynth_params, input_img_path, in_size, out_size):
+    ''' Run description written to telemetry log '''
+    try:
+        input_dims = list(get_image_size.get_image_size_cached(input_img_path))
+    except (OSError, get_image_size.UnknownImageFormat):
+        input_dims = None
+    return {'gen_type': tsynth_params.gen_type, 'input': input_img_path, 'input_dims': input_dims,
+            'in_size': in_size, 'out_size': out_size, 'params': tsynth_props.settings_to_dict(tsynth_params)}
+
+
+def log_telemetry(meta, status, usage=None, returncode=None):
+    if not get_addon_preferences().log_telemetry:
         return
-    if LAST_EDIT_TIME is None:  # dir and or did not exist. Use isFile to check img was generated
-        if os.path.isfile(out_path):
-            time.sleep(.300)  # just give time for file to be written?
-            existing_imgs = bpy.data.images[:]
-            x= bpy.data.images.load(out_path, check_existing=True)
-            if x in existing_imgs:
-                x.reload()
-            LAST_EDIT_TIME = 0
-            return
+    record = dict(meta, status=status, returncode=returncode, **(usage or {}))
+    tsynth_telemetry.write_record(os.path.join(get_cache_dir(''), 'telemetry.jsonl'), record)
+
+
+def lookup_cached_result(cache, command, out_path, wait_for):
+    ''' Worker thread: (cache key, True if result was restored to out_path). Inputs are hashed here - batch of big textures would freeze UI '''
+    wait(wait_for)  # guides still being written can be hashed only once they are complete
+    try:
+        key = cache.make_key(command, out_path)
+    except OSError as e:
+        print(f'Could not hash inputs of {out_path}, result cache is not used: {e}')
+        return None, False
+    return key, cache.restore(key, out_path)
+
+
+def shutdown_cache_lookups():
+    global CACHE_EXECUTOR
+    if CACHE_EXECUTOR is not None:
+        CACHE_EXECUTOR.shutdown(wait=False)
+        CACHE_EXECUTOR = None
+
+
+def submit_job(command, out_path, batch=None, load_result=True, meta=None, show_result=False, then=None, wait_for=()):
+    ''' Queue texture-synthesis run. If same inputs and settings were generated before, output is restored from cache instead - job finishes as CACHED.
+    Cache key is made on worker thread, job waits for it, and for wait_for futures (inputs being written). then(job) is called after result is loaded, unless job was cancelled '''
+    global CACHE_EXECUTOR
+    meta = meta or {}
+    cache = get_result_cache()
+    wait_for = tsynth_guides.pending_exports(command) + list(wait_for)
+    cached = None
+    if cache:
+        if CACHE_EXECUTOR is None:
+            CACHE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tsynth_cache')  # one worker - file digests are memoized in plain dict
+        cached = CACHE_EXECUTOR.submit(lookup_cached_result, cache, command, out_path, wait_for)
+        wait_for = wait_for + [cached]
+
+    def on_done(job):
+        if job.status == tsynth_jobs.CACHED:
+            print(f'Restored {out_path} from result cache')
+            log_telemetry(job.meta, job.status)
+        else:
+            log_telemetry(job.meta, job.status, job.resource_usage(), job.returncode)
+        if cached is not None and job.status == tsynth_jobs.DONE and cached.result()[0]:
+            cache.store(cached.result()[0], job.out_path)
+        if load_result:
+            load_generated_image(job, show_result)
+        if then is not None and job.status != tsynth_jobs.CANCELLED:
+            then(job)
+
+    job = tsynth_jobs.scheduler.submit(command, out_path, batch, timeout=get_addon_preferences().job_timeout, on_done=on_done, wait_for=wait_for)
+    job.meta = meta
+    if cached is not None:
+        job.restore = lambda job: cached.result()[1]
+    start_jobs_timer()
+    return job
+
+
+def submit_progressive_job(tsynth_params, command, out_path, meta):
+    ''' Quick run at preview_percent of in/out size, shown in Image Editor as soon as it is ready. Then full size run replaces it '''
+    percent = tsynth_params.preview_percent
+    preview_in_size = scale_size(meta['in_size'], percent)
+    preview_out_size = scale_size(meta['out_size'], percent)
+    preview_meta = dict(meta, in_size=preview_in_size, out_size=preview_out_size, progressive='preview')
+
+    def run_final(preview_job):
+        submit_job(command, out_path, meta=dict(meta, progressive='final'), show_result=True)
+
+    return submit_job(with_sizes(command, preview_in_size, preview_out_size), out_path, meta=preview_meta, show_result=True, then=run_final)
+
+
+def read_image_pixels(img_path):
+    ''' Image file as (height, width, 4) float32 array, top row first. None if it can not be loaded '''
+    try:
+        return np.flipud(tsynth_png.decode_png(img_path))
+    except (OSError, ValueError, zlib.error):
+        pass  # not plain PNG - let blender decode it
+    try:
+        img = bpy.data.images.load(img_path)
+    except RuntimeError as e:
+        print(f'Could not load {img_path}: {e}')
+        return None
+    try:
+        width, height = img.size
+        pixels = np.empty(width * height * 4, dtype=np.float32)
+        img.pixels.foreach_get(pixels)
+    finally:
+        bpy.data.images.remove(img)
+    return np.flipud(pixels.reshape(height, width, 4))  # blender stores bottom row first
+
+
+def pixels_to_image(name, pixels, file_path):
+    ''' Write (height, width, 4) array, top row first, into image datablock named name (reused if it exists) and save it to file_path '''
+    height, width = pixels.shape[:2]
+    img = bpy.data.images.get(name)
+    if img is None:
+        img = bpy.data.images.new(name, width, height, alpha=True)
+    elif tuple(img.size) != (width, height):
+        img.scale(width, height)
+    img.pixels.foreach_set(np.ascontiguousarray(np.flipud(pixels)).ravel())
+    img.filepath_raw = file_path
+    img.file_format = 'PNG'
+    img.save()
+    return img
+
+
+class SweepSheet:
+    ''' Collects results of parameter sweep runs. Once every run is finished, they are put into single labeled contact sheet image '''
+    def __init__(self, name, sheet_path, columns=0):
+        self.name = name
+        self.sheet_path = sheet_path
+        self.columns = columns
+        self.cells = []  # (label, out_path)
+        self.finished = 0
+
+    def add(self, label, out_path):
+        self.cells.append((label, out_path))
+
+    def cell_done(self, job):
+        self.finished += 1
+        if self.finished == len(self.cells):
+            self.build()
+
+    def build(self):
+        tiles = [read_image_pixels(out_path) if os.path.isfile(out_path) else None for _, out_path in self.cells]
+        sheet = tsynth_sheet.make_contact_sheet(tiles, [label for label, _ in self.cells], self.columns)
+        img = pixels_to_image(self.name, sheet, self.sheet_path)
+        show_in_image_editor(img)
+        print(f'Sweep contact sheet with {len(tiles)} results saved to {self.sheet_path}')
+
+
+def submit_tiled_job(tsynth_params, out_path, in_size, out_size, input_img_path, meta):
+    ''' Split output into tiles, see tsynth_tiles. Tiles are regular scheduler jobs, so they respect max_jobs and result cache.
+    Tile canvases and final blend run on TILE_EXECUTOR - they read tiles with tsynth_png only, blender loader is main thread only '''
+    global TILE_EXECUTOR
+    if tsynth_params.gen_type == 'multi-generate':
+        inputs = [os.path.join(tsynth_params.input_images_dir, img_info.image_name) for img_info in tsynth_params.selected_imgs]
     else:
-        if os.path.getmtime(out_path) > LAST_EDIT_TIME:
-            time.sleep(.300)
-            existing_imgs = bpy.data.images[:]
-            x = bpy.data.images.load(out_path, check_existing=True)
-            if x in existing_imgs:
-                x.reload()
-            LAST_EDIT_TIME = 0
-            return
-    return 1  # else wait another 0.5 sec
+        inputs = [input_img_path]
+    width, height = (int(v) for v in out_size.split('x'))
+    work_dir = os.path.join(gettempdir(), 'tsynth_tiles', os.path.splitext(os.path.basename(out_path))[0])
+    batch = tsynth_jobs.SynthBatch(os.path.basename(out_path) + ' tiles')
+
+    def on_finished(ok):
+        if ok:
+            load_image(out_path, show=True)
+
+    if TILE_EXECUTOR is None:
+        TILE_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='tsynth_tiles')
+    tiled = tsynth_tiles.TiledSynthesis(get_addon_preferences().text_synth_path, tsynth_props.settings_to_dict(tsynth_params), inputs, in_size,
+                                        width, height, out_path, work_dir, tsynth_params.tile_size, tsynth_params.tile_overlap,
+                                        on_finished=on_finished, executor=TILE_EXECUTOR, defer=defer_to_main)
+
+    def submit(command, tile_path, callback, wait_for):
+        submit_job(command, tile_path, batch, load_result=False, meta=dict(meta, tile=os.path.basename(tile_path)),
+                   then=lambda job: callback(job.status in tsynth_jobs.SUCCEEDED), wait_for=wait_for)
+
+    tiled.start(submit)
+    return tiled
+
+
+def load_memory_history(scheduler):
+    ''' Teach memory model peak RSS of runs from earlier sessions, once '''
+    global MEMORY_HISTORY_LOADED
+    if MEMORY_HISTORY_LOADED:
+        return
+    MEMORY_HISTORY_LOADED = True
+    log_path = os.path.join(get_cache_dir(''), 'telemetry.jsonl')
+    try:
+        scheduler.memory_model.observe_records(tsynth_telemetry.read_records(log_path))
+    except OSError:  # nothing logged yet
+        pass
+
+
+def tick_jobs():
+    scheduler = tsynth_jobs.scheduler
+    addon_prefs = get_addon_preferences()
+    scheduler.max_jobs = addon_prefs.max_jobs
+    scheduler.partition_cores = addon_prefs.partition_cores
+    scheduler.ram_budget_mb = tsynth_memory.budget_mb(addon_prefs.ram_budget)
+    load_memory_history(scheduler)
+    jobs_left = scheduler.tick()
+    apply_decoded_images()
+    run_deferred_callbacks()
+    redraw_image_editors()
+    if PENDING_LOADS or PENDING_CALLBACKS:
+        return 0.1
+    return 0.5 if jobs_left else None
+
+
+def start_jobs_timer():
+    if not bpy.app.timers.is_registered(tick_jobs):
+        bpy.app.timers.register(tick_jobs, first_interval=0.1)
 
 
 class TSYNTH_OT_TextureSynthesis(bpy.types.Operator):
@@ -88,6 +440,8 @@ class TSYNTH_OT_TextureSynthesis(bpy.types.Operator):
     bl_description = "Synthesise texture image.\n[Shift+Click] will generate output image for all source image files in folder."
     bl_options = {'REGISTER'}
 
+    live: bpy.props.BoolProperty(name='Live', description='Run from live update - preview size, output to temp live image', default=False, options={'HIDDEN', 'SKIP_SAVE'})
+
     shift_clicked = False
 
     def invoke(self, context, event):
@@ -111,95 +465,165 @@ class TSYNTH_OT_TextureSynthesis(bpy.types.Operator):
             out_path = os.path.join(tmp, out_name)
         return out_path
 
+    @classmethod
+    def get_batch_items(cls, context):
+        ''' [(input image path, output path)] for Shift+Click batch - every image in input folder '''
+        tsynth_params = context.scene.tsynth_params
+        pcoll = tsynth_props.preview_collections["main"]
+        items = []
+        for ico_name in sorted(pcoll.enum_items):  # pcoll.keys() has only images whose thumbnail is already made
+            out_name = os.path.splitext(ico_name)[0]+'.png'  # texture_synthesis.exe only works with png
+            items.append((os.path.join(tsynth_params.input_images_dir, ico_name), cls.get_output_path(context, out_name)))
+        return items
+
     def execute(self, context):
         tsynth_params = context.scene.tsynth_params
 
         if tsynth_params.out_method != 'OVERRIDE' or tsynth_params.gen_type == 'multi-generate':
             out_name = tsynth_params.output_file_name
         else:  # if output override and not 'multi-generate'
-            out_name = tsynth_params.my_previews[:-3]+'png'  # texture_synthesis.exe only works with png
+            out_name = os.path.splitext(tsynth_params.my_previews)[0]+'.png'  # texture_synthesis.exe only works with png
         out_path = self.get_output_path(context, out_name)
-
-        in_size = f"{tsynth_params.in_size_preset_x}x{tsynth_params.in_size_preset_y}" if tsynth_params.in_size_from_preset else f"{int(tsynth_params.in_size_x*tsynth_params.in_size_percent/100)}x{int(tsynth_params.in_size_y*tsynth_params.in_size_percent/100)}"
-        out_size = f"{tsynth_params.out_size_preset_x}x{tsynth_params.out_size_preset_y}" if tsynth_params.out_size_from_preset else f"{int(tsynth_params.out_size_x*tsynth_params.out_size_percent/100)}x{int(tsynth_params.out_size_y*tsynth_params.out_size_percent/100)}"
+        if self.live:  # separate output - live preview never overrides real result. Same path for each live run, so stale run gets cancelled
+            live_dir = os.path.join(gettempdir(), 'tsynth_live')
+            os.makedirs(live_dir, exist_ok=True)
+            out_path = os.path.join(live_dir, os.path.splitext(out_name)[0] + '_live.png')
+
+        in_size, out_size = get_sizes(tsynth_params)
+        if self.live:
+            in_size = scale_size(in_size, tsynth_params.preview_percent)
+            out_size = scale_size(out_size, tsynth_params.preview_percent)
         input_img_path = os.path.join(tsynth_params.input_images_dir, tsynth_params.my_previews)
-        command = [get_addon_preferences().text_synth_path,
-                   "--out", out_path,
-                   "--out-size", out_size,
-                   "--seed", str(tsynth_params.seed),
-                   "--rand-init", str(tsynth_params.rand_init),
-                   "--k-neighs", str(tsynth_params.k_neighs),
-                   "--cauchy", str(tsynth_params.cauchy),
-                   "--backtrack-pct", str(tsynth_params.backtrack_pct/100),
-                   "--backtrack-stages", str(tsynth_params.backtrack_stages),
-                   "--in-size", in_size]
-        if tsynth_params.tiling:
-            command.append('--tiling')
-        # if tsynth_params.gen_type != 'generate':
-        if tsynth_params.gen_type == 'generate':
-            if self.shift_clicked:
-                pcoll = tsynth_props.preview_collections["main"]
-                for ico_name in pcoll.keys():
-                    out_name = ico_name[:-3]+'png'  # texture_synthesis.exe only works with png
-                    out_path = self.get_output_path(context, out_name)
-                    command[2] = out_path  # change output name for each generated img
-                    multi_command = command + ['generate', os.path.join(tsynth_params.input_images_dir, ico_name)]
-                    print(multi_command)
-                    subprocess.Popen(multi_command)
-                return {'FINISHED'}
-
-            command.extend(['generate', input_img_path])
-
-        elif tsynth_params.gen_type == 'multi-generate':
-            sel_images = [os.path.join(tsynth_params.input_images_dir, img_info.image_name) for img_info in tsynth_params.selected_imgs]
-            command.extend(['generate']+sel_images)
-
-        elif tsynth_params.gen_type == 'guided-synthesis':
-            if not tsynth_params.from_guide or not tsynth_params.from_guide.has_data:
-                self.report({'ERROR'}, 'From guide image is empty. Canceling')
-                return {'CANCELLED'}
-            if not tsynth_params.to_guide or not tsynth_params.to_guide.has_data:
-                self.report({'ERROR'}, 'To guide image is empty. Canceling')
+        if tsynth_params.gen_type == 'generate' and self.shift_clicked and not self.live:
+            batch = tsynth_jobs.SynthBatch(os.path.basename(os.path.normpath(tsynth_params.input_images_dir)))
+            for ico_path, out_path in self.get_batch_items(context):
+                multi_command = build_command(tsynth_params, out_path, in_size, out_size, ico_path)
+                submit_job(multi_command, out_path, batch, load_result=False, meta=get_job_meta(tsynth_params, ico_path, in_size, out_size))
+            self.report({'INFO'}, f'Queued {len(batch.jobs)} images, max {get_addon_preferences().max_jobs} at once')
+            return {'FINISHED'}
+
+        try:
+            command = build_command(tsynth_params, out_path, in_size, out_size, input_img_path)
+        except ValueError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        meta = get_job_meta(tsynth_params, input_img_path, in_size, out_size)
+        width, height = (int(v) for v in out_size.split('x'))
+        if self.live:
+            submit_job(command, out_path, meta=dict(meta, live=True), show_result=True)
+        elif tsynth_params.tiled and max(width, height) > tsynth_params.tile_size:
+            if tsynth_params.gen_type not in ('generate', 'multi-generate'):
+                self.report({'ERROR'}, 'Tiled works only for Generate and Multi Generate')
                 return {'CANCELLED'}
-            tsynth_params.from_guide.filepath_raw = out_path[:-4] + '_from.png'
-            tsynth_params.from_guide.save()
-            tsynth_params.to_guide.filepath_raw = out_path[:-4] + '_to.png'
-            tsynth_params.to_guide.save()
-            command.extend(['generate',
-                            '--target-guide', tsynth_params.to_guide.filepath_raw,
-                            '--guides', tsynth_params.from_guide.filepath_raw,
-                            '--', input_img_path])  # ? or '--'+tsynth_params.input_img ?
-
-        elif tsynth_params.gen_type == 'transfer-style':  # TODO:
-            if tsynth_params.to_guide is None:
-                self.report({'ERROR'}, 'To guide image is empty!. Canceling')
+            try:
+                tiled = submit_tiled_job(tsynth_params, out_path, in_size, out_size, input_img_path, meta)
+            except (OSError, ValueError) as e:
+                self.report({'ERROR'}, str(e))
                 return {'CANCELLED'}
-            # tsynth_params.to_guide.filepath_raw = out_path[:-4] + 'to_guide.png' #it should be loaded img....
-            tsynth_params.to_guide.save()
-            command[1:1] = ['--alpha', str(tsynth_params.alpha)]  # add at begning after program name
-            command.extend(['transfer-style',
-                            '--style', input_img_path,
-                            '--guide', bpy.path.abspath(tsynth_params.to_guide.filepath_raw)])
-
-        elif tsynth_params.gen_type == 'inpaint':
-            if not tsynth_params.to_guide or not tsynth_params.to_guide.has_data:
-                self.report({'ERROR'}, 'To guide image is empty. Canceling')
-                return {'CANCELLED'}
-            tsynth_params.to_guide.filepath_raw = out_path[:-4] + '_inpaint.png'
-            tsynth_params.to_guide.save()
-            command.extend(['--inpaint', bpy.path.abspath(tsynth_params.to_guide.filepath_raw),
-                            'generate', input_img_path])
+            self.report({'INFO'}, f'Generating {out_size} as {len(tiled.tiles)} tiles')
+        elif tsynth_params.progressive:
+            submit_progressive_job(tsynth_params, command, out_path, meta)
+        else:
+            submit_job(command, out_path, meta=meta)
+        return {'FINISHED'}
 
-        print(command)
-        subprocess.Popen(command)
 
-        global LAST_EDIT_TIME, COUNT_TIME  # we will wait till file is generated
-        if os.path.isfile(out_path):
-            LAST_EDIT_TIME = os.path.getmtime(out_path)
-        else:
-            LAST_EDIT_TIME = None
-        COUNT_TIME = time.time()
-        bpy.app.timers.register(functools.partial(check_file_was_generated, out_path), first_interval=1)
+class TSYNTH_OT_ParameterSweep(bpy.types.Operator):
+    bl_idname = "object.tsynth_sweep"
+    bl_label = "Parameter Sweep"
+    bl_description = "Generate image for every combination of listed seeds, cauchy, neighbours and backtrack stages, and show them on one contact sheet.\n" \
+                     "Values are comma separated, ranges are written as start:stop or start:stop:step. Empty field uses current value"
+    bl_options = {'REGISTER'}
+
+    seeds: bpy.props.StringProperty(name='Seeds', description='eg. 1,5,9 or 0:7', default='0:3')
+    cauchy_values: bpy.props.StringProperty(name='Cauchy', description='eg. 0.5:1:0.25. Empty - current value', default='')
+    k_neighs_values: bpy.props.StringProperty(name='Neighbours', description='eg. 20,50. Empty - current value', default='')
+    backtrack_stages_values: bpy.props.StringProperty(name='Backtrack Stages', description='eg. 2:5. Empty - current value', default='')
+    size_percent: bpy.props.IntProperty(name='Size', description='In and out size of sweep runs, relative to current settings', default=50, min=5, max=100, subtype='PERCENTAGE')
+    columns: bpy.props.IntProperty(name='Columns', description='Contact sheet columns. 0 - square grid', default=0, min=0)
+
+    MAX_RUNS = 64
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        tsynth_params = context.scene.tsynth_params
+        try:
+            axes = [(option, label, tsynth_sheet.parse_values(text, cast) if text.strip() else [current])
+                    for option, label, text, cast, current in (
+                        ('--seed', 's', self.seeds, int, tsynth_params.seed),
+                        ('--cauchy', 'c', self.cauchy_values, float, round(tsynth_params.cauchy, 3)),
+                        ('--k-neighs', 'k', self.k_neighs_values, int, tsynth_params.k_neighs),
+                        ('--backtrack-stages', 'b', self.backtrack_stages_values, int, tsynth_params.backtrack_stages))]
+        except ValueError as e:
+            self.report({'ERROR'}, f'Could not parse sweep values: {e}')
+            return {'CANCELLED'}
+        combinations = tsynth_sheet.sweep_combinations([(option, values) for option, _, values in axes])
+        if not combinations:
+            self.report({'ERROR'}, 'Nothing to sweep - value list is empty')
+            return {'CANCELLED'}
+        if len(combinations) > self.MAX_RUNS:
+            self.report({'ERROR'}, f'{len(combinations)} runs requested, max is {self.MAX_RUNS}. Narrow down value ranges')
+            return {'CANCELLED'}
+
+        sweep_dir = os.path.join(gettempdir(), 'tsynth_sweep')
+        os.makedirs(sweep_dir, exist_ok=True)
+        in_size, out_size = (scale_size(size, self.size_percent) for size in get_sizes(tsynth_params))
+        input_img_path = os.path.join(tsynth_params.input_images_dir, tsynth_params.my_previews)
+        try:
+            command = build_command(tsynth_params, os.path.join(sweep_dir, 'sweep.png'), in_size, out_size, input_img_path)
+        except ValueError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        name = os.path.splitext(tsynth_params.output_file_name)[0] + '_sweep'
+        sheet = SweepSheet(name, os.path.join(sweep_dir, name + '.png'), self.columns)
+        batch = tsynth_jobs.SynthBatch(name)
+        meta = get_job_meta(tsynth_params, input_img_path, in_size, out_size)
+        runs = []
+        for index, combination in enumerate(combinations):
+            out_path = os.path.join(sweep_dir, f'{name}_{index:03d}.png')
+            options = {option: str(value) for option, value in combination.items()}
+            options['--out'] = out_path
+            label = ' '.join(f'{short}{combination[option]}' for option, short, values in axes if len(values) > 1) or 's' + str(combination['--seed'])
+            sheet.add(label, out_path)
+            runs.append((out_path, options))
+        for out_path, options in runs:  # all cells first - sheet is built once every added cell finished
+            submit_job(with_options(command, options), out_path, batch, load_result=False,
+                       meta=dict(meta, sweep=options), then=sheet.cell_done)
+        self.report({'INFO'}, f'Queued {len(combinations)} sweep runs, max {get_addon_preferences().max_jobs} at once')
+        return {'FINISHED'}
+
+
+class TSYNTH_OT_ExportJobQueue(bpy.types.Operator):
+    bl_idname = "object.tsynth_export_queue"
+    bl_label = "Export Job Queue"
+    bl_description = "Write Shift+Click batch (every image in input folder, with current settings) to shared job queue directory.\n" \
+                     "Drain it on one or more hosts with: python tsynth_queue.py work <queue dir> --exe <texture-synthesis>"
+    bl_options = {'REGISTER'}
+
+    directory: bpy.props.StringProperty(name='Queue Directory', subtype='DIR_PATH')
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        tsynth_params = context.scene.tsynth_params
+        settings = tsynth_props.settings_to_dict(tsynth_params)
+        in_size, out_size = get_sizes(tsynth_params)
+        defaults = {key: settings[key] for key in tsynth_command.DEFAULT_SETTINGS}
+        defaults.update(gen_type='generate', in_size=in_size, out_size=out_size)
+        jobs = [{'inputs': [os.path.abspath(ico_path)], 'out': os.path.abspath(out_path)}
+                for ico_path, out_path in TSYNTH_OT_TextureSynthesis.get_batch_items(context)]
+        try:
+            queued = tsynth_queue.enqueue(bpy.path.abspath(self.directory), {'defaults': defaults, 'jobs': jobs})
+        except OSError as e:
+            self.report({'ERROR'}, f'Could not write job queue: {e}')
+            return {'CANCELLED'}
+        self.report({'INFO'}, f'Queued {queued} jobs in {self.directory}')
         return {'FINISHED'}
 
 
@@ -210,5 +634,10 @@ class TSYNTH_OT_RefreshDir(bpy.types.Operator):
     bl_options = {"REGISTER","UNDO"}
 
     def execute(self, context):
-        tsynth_props.FORCE_REFRESH_ICO = True
+        pcoll = tsynth_props.preview_collections["main"]
+        directory = context.scene.tsynth_params.input_images_dir
+        if directory != pcoll.input_images_dir:  # not scanned yet - enum callback will do full scan
+            return {"FINISHED"}
+        added, removed, changed = tsynth_props.update_previews(pcoll, directory)
+        self.report({'INFO'}, f'Added: {len(added)}, removed: {len(removed)}, changed: {len(changed)} images')
         return {"FINISHED"}
@@ -0,0 +1,47 @@
+# Run from repo root: python -m unittest discover -s tests
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tsynth_command
+
+
+class TestJobsFromDirectory(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        for name in ('a.png', 'b.jpg', 'notes.txt'):
+            open(os.path.join(self.dir, name), 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_images_only(self):
+        out_dir = os.path.join(self.dir, 'out')
+        jobs = tsynth_command.jobs_from_directory('ts', self.dir, out_dir, {})
+        self.assertEqual([out_path for _, out_path in jobs], [os.path.join(out_dir, 'a.png'), os.path.join(out_dir, 'b.png')])
+        self.assertEqual(jobs[0][0][-2:], ['generate', os.path.join(self.dir, 'a.png')])
+
+    def test_input_directory_rejected(self):
+        with self.assertRaises(ValueError):
+            tsynth_command.jobs_from_directory('ts', self.dir, self.dir + os.sep, {})
+
+    def test_input_directory_with_overwrite(self):
+        jobs = tsynth_command.jobs_from_directory('ts', self.dir, self.dir, {}, overwrite=True)
+        self.assertEqual(jobs[0][1], os.path.join(self.dir, 'a.png'))
+
+    def test_cli_default_out_dir_is_subdirectory(self):
+        exe = os.path.join(self.dir, 'missing-exe')
+        tsynth_command.main(['--exe', exe, '--dir', self.dir, '-j', '1'])  # exe is missing - jobs fail, sources must stay
+        self.assertTrue(os.path.isdir(os.path.join(self.dir, tsynth_command.DEFAULT_OUT_SUBDIR)))
+        self.assertEqual(sorted(os.listdir(self.dir)), sorted(['a.png', 'b.jpg', 'notes.txt', tsynth_command.DEFAULT_OUT_SUBDIR]))
+
+    def test_cli_refuses_input_directory(self):
+        self.assertEqual(tsynth_command.main(['--exe', 'ts', '--dir', self.dir, '--out-dir', self.dir]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+# Tests of bpy-free modules. Run from repo root: python -m unittest discover -s tests
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tsynth_jobs
+
+# stands in for texture-synthesis: fails if any example is missing, else writes its arguments to --out
+FAKE_EXE = '''import os, sys
+args = sys.argv[1:]
+out = args[args.index('--out') + 1]
+missing = [a for a in args[args.index('generate') + 1:] if not os.path.isfile(a)]
+if missing:
+    sys.stderr.write('missing input %s\\n' % missing)
+    sys.exit(1)
+open(out, 'w').write(' '.join(args))
+'''
+
+
+# draws bar only on terminal, like indicatif does
+FAKE_PROGRESS_EXE = '''import os, sys, time
+if os.isatty(2):
+    for pos in (10, 55):
+        sys.stderr.write('\\r\\x1b[2K[00:00:01] ####---- %3d/100 Total' % pos)
+        sys.stderr.flush()
+        time.sleep(0.3)
+'''
+
+
+def run_until_done(scheduler, limit=20):
+    end = time.time() + limit
+    while scheduler.tick():
+        if time.time() > end:
+            raise AssertionError('jobs did not finish in time')
+        time.sleep(0.02)
+
+
+class TestSynthJobCommand(unittest.TestCase):
+    def test_only_out_value_is_redirected(self):
+        job = tsynth_jobs.SynthJob(['ts', '--out', 'img/a.png', 'generate', 'img/a.png'], 'img/a.png')
+        self.assertEqual(job.command, ['ts', '--out', 'img/a.tsynth-tmp.png', 'generate', 'img/a.png'])
+
+    def test_short_out_option(self):
+        job = tsynth_jobs.SynthJob(['ts', '-o', 'a.png', '--inpaint', 'm.png', 'generate', 'a.png', 'b.png'], 'a.png')
+        self.assertEqual(job.command, ['ts', '-o', 'a.tsynth-tmp.png', '--inpaint', 'm.png', 'generate', 'a.png', 'b.png'])
+
+
+class TestJobProgress(unittest.TestCase):
+    def test_total_and_stage_bars(self):
+        progress = tsynth_jobs.JobProgress()
+        progress.feed('[00:00:03] ########-------- 45/100 Total', True)
+        progress.feed('[00:00:03] ##-------------- 7/50 Stage 3', True)
+        self.assertEqual(progress.percent, 45.0)
+        self.assertEqual(progress.stage, 'Stage 3')
+        self.assertEqual(progress.stage_percent, 14.0)
+
+    def test_padded_values(self):
+        progress = tsynth_jobs.JobProgress()
+        progress.feed('[00:00:01]  ###-----      30/     120 Total', False)
+        self.assertEqual(progress.percent, 25.0)
+
+    def test_ansi_stripped(self):
+        progress = tsynth_jobs.JobProgress()
+        progress.feed('\x1b[?25l\x1b[2K\x1b[32m[00:00:01]\x1b[0m 3/4 Total\x1b[1A', True)
+        self.assertEqual(progress.percent, 75.0)
+        self.assertEqual(progress.stderr_tail[-1], '[00:00:01] 3/4 Total')
+
+    def test_plain_percent(self):
+        progress = tsynth_jobs.JobProgress()
+        progress.feed('done 12.5%', False)
+        self.assertEqual(progress.percent, 12.5)
+
+    def test_blank_lines_ignored(self):
+        progress = tsynth_jobs.JobProgress()
+        progress.feed(' \x1b[2K ', True)
+        self.assertIsNone(progress.last_output_time)
+        self.assertEqual(len(progress.stderr_tail), 0)
+
+
+class TestReadStream(unittest.TestCase):
+    def test_carriage_return_redraws(self):
+        progress = tsynth_jobs.JobProgress()
+        tsynth_jobs.read_stream(BytesIO(b'\r 1/4 Total\r 2/4 Total\r 3/4 Total\r\nerror: bad\r\n'), progress, True)
+        self.assertEqual(progress.percent, 75.0)
+        self.assertEqual(list(progress.stderr_tail), ['1/4 Total', '2/4 Total', '3/4 Total', 'error: bad'])
+
+    def test_last_line_without_newline(self):
+        progress = tsynth_jobs.JobProgress()
+        tsynth_jobs.read_stream(BytesIO(b'1/2 Total\r2/2 Total'), progress, False)
+        self.assertEqual(progress.percent, 100.0)
+
+    def test_line_split_between_reads(self):
+        class Chunked(BytesIO):
+            def read1(self, size=-1):
+                return super().read1(3)
+        progress = tsynth_jobs.JobProgress()
+        tsynth_jobs.read_stream(Chunked(b'\r  17/100 Total\r'), progress, True)
+        self.assertEqual(progress.percent, 17.0)
+        self.assertEqual(list(progress.stderr_tail), ['17/100 Total'])
+
+
+class TestJobScheduler(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.exe = os.path.join(self.dir, 'fake_ts.py')
+        with open(self.exe, 'w') as f:
+            f.write(FAKE_EXE)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def command(self, out_path, input_path):
+        return [sys.executable, self.exe, '--out', out_path, 'generate', input_path]
+
+    def test_output_overrides_its_input(self):
+        ''' out_method OVERRIDE / --dir without --out-dir: input and output are same file '''
+        img = os.path.join(self.dir, '1.png')
+        with open(img, 'w') as f:
+            f.write('source')
+        scheduler = tsynth_jobs.JobScheduler(1)
+        job = scheduler.submit(self.command(img, img), img)
+        run_until_done(scheduler)
+        self.assertEqual(job.status, tsynth_jobs.DONE, job.error)
+        with open(img) as f:
+            self.assertTrue(f.read().endswith('generate ' + img))
+        self.assertFalse(os.path.exists(job.tmp_path))
+
+    def test_failed_job_keeps_old_output(self):
+        out = os.path.join(self.dir, 'out.png')
+        with open(out, 'w') as f:
+            f.write('old')
+        scheduler = tsynth_jobs.JobScheduler(1)
+        job = scheduler.submit(self.command(out, os.path.join(self.dir, 'missing.png')), out)
+        run_until_done(scheduler)
+        self.assertEqual(job.status, tsynth_jobs.FAILED)
+        self.assertIn('missing input', job.error)
+        with open(out) as f:
+            self.assertEqual(f.read(), 'old')
+
+    @unittest.skipUnless(hasattr(os, 'openpty'), 'no pseudo terminal on this platform')
+    def test_progress_of_terminal_only_bars(self):
+        exe = os.path.join(self.dir, 'fake_progress.py')
+        with open(exe, 'w') as f:
+            f.write(FAKE_PROGRESS_EXE)
+        scheduler = tsynth_jobs.JobScheduler(1)
+        job = scheduler.submit([sys.executable, exe, '--out', os.path.join(self.dir, 'p.png')], os.path.join(self.dir, 'p.png'))
+        seen = set()
+        end = time.time() + 20
+        while scheduler.tick() and time.time() < end:
+            seen.add(job.progress.percent)
+            time.sleep(0.02)
+        self.assertIn(10.0, seen)
+        self.assertEqual(job.progress.percent, 55.0)
+
+    def test_restored_job_is_not_run(self):
+        out = os.path.join(self.dir, 'out.png')
+        scheduler = tsynth_jobs.JobScheduler(1)
+        job = scheduler.submit(self.command(out, os.path.join(self.dir, 'missing.png')), out)
+        job.restore = lambda job: True
+        run_until_done(scheduler)
+        self.assertEqual(job.status, tsynth_jobs.CACHED)
+        self.assertIsNone(job.proc)
+
+    def test_max_jobs(self):
+        scheduler = tsynth_jobs.JobScheduler(2)
+        img = os.path.join(self.dir, 'in.png')
+        open(img, 'w').close()
+        jobs = [scheduler.submit(self.command(os.path.join(self.dir, f'{i}.png'), img), os.path.join(self.dir, f'{i}.png')) for i in range(5)]
+        scheduler.tick()
+        self.assertEqual(len(scheduler.running), 2)
+        run_until_done(scheduler)
+        self.assertTrue(all(job.status == tsynth_jobs.DONE for job in jobs))
+
+
+if __name__ == '__main__':
+    unittest.main()
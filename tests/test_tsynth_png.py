@@ -0,0 +1,176 @@
+# Run from repo root: python -m unittest discover -s tests
+
+import os
+import sys
+import zlib
+import struct
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tsynth_png
+
+
+def chunk(chunk_type, payload):
+    return struct.pack('>L', len(payload)) + chunk_type + payload + struct.pack('>L', zlib.crc32(chunk_type + payload) & 0xffffffff)
+
+
+def filter_row(filter_type, row, prev, bpp):
+    ''' Reference PNG filters on plain lists of bytes '''
+    out = []
+    for i, value in enumerate(row):
+        left = row[i - bpp] if i >= bpp else 0
+        up = prev[i]
+        if filter_type == 0:
+            predictor = 0
+        elif filter_type == 1:
+            predictor = left
+        elif filter_type == 2:
+            predictor = up
+        elif filter_type == 3:
+            predictor = (left + up) // 2
+        else:
+            up_left = prev[i - bpp] if i >= bpp else 0
+            p = left + up - up_left
+            predictor = min((abs(p - left), 0, left), (abs(p - up), 1, up), (abs(p - up_left), 2, up_left))[2]
+        out.append((value - predictor) % 256)
+    return out
+
+
+def make_png(rows, width, color_type, bit_depth=8, filters=None, palette=None, trns=None):
+    ''' PNG bytes of rows (lists of raw bytes, top first), each row filtered with filters[i] (0 - None) '''
+    bpp = max(1, tsynth_png.CHANNELS[color_type] * bit_depth // 8)
+    data = b''
+    prev = [0] * len(rows[0])
+    for i, row in enumerate(rows):
+        filter_type = filters[i] if filters else 0
+        data += bytes([filter_type] + filter_row(filter_type, row, prev, bpp))
+        prev = row
+    png = tsynth_png.PNG_SIGNATURE + chunk(b'IHDR', struct.pack('>LLBBBBB', width, len(rows), bit_depth, color_type, 0, 0, 0))
+    if palette:
+        png += chunk(b'PLTE', bytes(palette))
+    if trns:
+        png += chunk(b'tRNS', bytes(trns))
+    return png + chunk(b'IDAT', zlib.compress(data)) + chunk(b'IEND', b'')
+
+
+class PNGTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, data, name='test.png'):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+
+class TestDecode(PNGTestCase):
+    # 3x3 RGBA, values chosen so Sub and Up differences wrap around 256
+    RGBA_ROWS = [[250, 10, 0, 255, 3, 200, 255, 128, 17, 17, 17, 0],
+                 [0, 0, 0, 255, 255, 255, 255, 255, 1, 2, 3, 4],
+                 [9, 250, 128, 64, 7, 8, 9, 10, 255, 0, 255, 0]]
+
+    def expected_rgba(self):
+        return np.array(self.RGBA_ROWS, dtype=np.float32).reshape(3, 3, 4)[::-1] / 255
+
+    def test_filters_none_sub_up(self):
+        for filters in ([0, 0, 0], [1, 1, 1], [0, 2, 2], [2, 1, 2], [1, 0, 2]):
+            with self.subTest(filters=filters):
+                path = self.write(make_png(self.RGBA_ROWS, 3, 6, filters=filters))
+                np.testing.assert_allclose(tsynth_png.decode_png(path), self.expected_rgba(), atol=1e-6)
+
+    def test_bottom_row_first(self):
+        path = self.write(make_png(self.RGBA_ROWS, 3, 6))
+        np.testing.assert_allclose(tsynth_png.decode_png(path)[0, 0], np.array([9, 250, 128, 64]) / 255, atol=1e-6)
+
+    def test_rgb_8_bit(self):
+        rows = [[1, 2, 3, 250, 251, 252], [100, 0, 255, 5, 5, 5]]
+        pixels = tsynth_png.decode_png(self.write(make_png(rows, 2, 2, filters=[1, 2])))
+        np.testing.assert_allclose(pixels[..., :3], np.array(rows, dtype=np.float32).reshape(2, 2, 3)[::-1] / 255, atol=1e-6)
+        self.assertTrue((pixels[..., 3] == 1.0).all())
+
+    def test_16_bit(self):
+        values = [[0, 1000, 65535], [40000, 12345, 256]]
+        rows = [[byte for value in row for byte in struct.pack('>H', value)] for row in values]
+        pixels = tsynth_png.decode_png(self.write(make_png(rows, 3, 0, bit_depth=16, filters=[1, 2])))
+        expected = np.array(values, dtype=np.float32)[::-1] / 65535
+        for channel in range(3):
+            np.testing.assert_allclose(pixels[..., channel], expected, atol=1e-6)
+
+    def test_gray_alpha_16_bit(self):
+        rows = [list(struct.pack('>HH', 30000, 65535)) + list(struct.pack('>HH', 65535, 0))]
+        pixels = tsynth_png.decode_png(self.write(make_png(rows, 2, 4, bit_depth=16)))
+        np.testing.assert_allclose(pixels[0], [[30000 / 65535] * 3 + [1.0], [1.0, 1.0, 1.0, 0.0]], atol=1e-6)
+
+    def test_palette_with_trns(self):
+        palette = [255, 0, 0, 0, 255, 0, 0, 0, 255]
+        trns = [0, 128]  # third entry has no alpha - opaque
+        pixels = tsynth_png.decode_png(self.write(make_png([[0, 1, 2], [2, 2, 0]], 3, 3, filters=[1, 2], palette=palette, trns=trns)))
+        expected_top = [[1, 0, 0, 0], [0, 1, 0, 128 / 255], [0, 0, 1, 1]]
+        np.testing.assert_allclose(pixels[1], expected_top, atol=1e-6)
+        np.testing.assert_allclose(pixels[0, 0], [0, 0, 1, 1], atol=1e-6)
+
+    def test_pool_buffer_reused(self):
+        pool = tsynth_png.BufferPool()
+        path = self.write(make_png(self.RGBA_ROWS, 3, 6))
+        first = tsynth_png.decode_png(path, pool)
+        pool.release(first)
+        self.assertIs(tsynth_png.decode_png(path, pool), first)
+
+    def test_average_and_paeth_rejected(self):
+        ''' ValueError makes callers fall back to blender loader '''
+        for filter_type in (3, 4):
+            with self.subTest(filter_type=filter_type):
+                path = self.write(make_png(self.RGBA_ROWS, 3, 6, filters=[1, filter_type, 0]))
+                with self.assertRaises(ValueError):
+                    tsynth_png.decode_png(path)
+
+    def test_unsupported_formats_rejected(self):
+        for data in (b'GIF89a' + b'\0' * 20, make_png([[1, 2]], 2, 0)[:-30]):
+            with self.subTest(data=data[:8]):
+                with self.assertRaises(ValueError):
+                    tsynth_png.decode_png(self.write(data))
+
+
+class TestEncode(PNGTestCase):
+    def test_round_trip(self):
+        rng = np.random.default_rng(3)
+        pixels = rng.integers(0, 256, (17, 13, 4)).astype(np.float32) / 255
+        path = tsynth_png.encode_png(pixels, os.path.join(self.dir, 'out.png'))
+        np.testing.assert_allclose(tsynth_png.decode_png(path), pixels, atol=1e-6)
+        self.assertEqual(os.listdir(self.dir), ['out.png'])
+
+    def test_rows_streamed_top_first(self):
+        pixels = np.zeros((4, 2, 4), dtype=np.float32)
+        pixels[:, :, 0] = np.arange(4)[:, None] / 255
+        path = os.path.join(self.dir, 'out.png')
+        with tsynth_png.PNGWriter(path, 2, 4) as writer:
+            writer.write_rows(pixels[:1])
+            writer.write_rows(pixels[1:])
+        np.testing.assert_allclose(tsynth_png.decode_png(path)[::-1], pixels, atol=1e-6)
+
+    def test_short_write_leaves_no_files(self):
+        path = os.path.join(self.dir, 'out.png')
+        writer = tsynth_png.PNGWriter(path, 2, 4)
+        writer.write_rows(np.zeros((3, 2, 4), dtype=np.float32))
+        with self.assertRaises(ValueError):
+            writer.close()
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_error_inside_with_leaves_no_files(self):
+        path = os.path.join(self.dir, 'out.png')
+        with self.assertRaises(RuntimeError):
+            with tsynth_png.PNGWriter(path, 2, 4) as writer:
+                writer.write_rows(np.zeros((2, 2, 4), dtype=np.float32))
+                raise RuntimeError('stop')
+        self.assertEqual(os.listdir(self.dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
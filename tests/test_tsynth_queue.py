@@ -0,0 +1,152 @@
+# Run from repo root: python -m unittest discover -s tests
+
+import os
+import sys
+import time
+import json
+import shutil
+import tempfile
+import unittest
+import subprocess
+from unittest import mock
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+import tsynth_jobs
+import tsynth_queue
+
+# stands in for texture-synthesis: logs its output path (one short append - atomic), then writes it
+FAKE_EXE = '''import sys, time
+args = sys.argv[1:]
+out = args[args.index('--out') + 1]
+with open(sys.argv[-1] + '.runs', 'a') as log:
+    log.write(out + '\\n')
+time.sleep(0.1)
+open(out, 'w').write('ok')
+'''
+
+
+class QueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.queue_dir = os.path.join(self.dir, 'queue')
+        self.source = os.path.join(self.dir, 'source.png')
+        open(self.source, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def enqueue(self, count):
+        jobs = [{'inputs': [self.source], 'out': os.path.join(self.dir, 'out', f'{i}.png'), 'seed': i} for i in range(count)]
+        return tsynth_queue.enqueue(self.queue_dir, {'defaults': {'k_neighs': 5}, 'jobs': jobs})
+
+
+class TestClaims(QueueTestCase):
+    def test_enqueue_merges_defaults(self):
+        self.assertEqual(self.enqueue(2), 2)
+        claim, job = tsynth_queue.claim_next(self.queue_dir, 'w1')
+        self.assertEqual(job['k_neighs'], 5)
+        self.assertEqual(job['seed'], 0)
+
+    def test_each_job_claimed_once(self):
+        self.enqueue(3)
+        ids = [tsynth_queue.claim_next(self.queue_dir, worker)[0].job_id for worker in ('w1', 'w2', 'w1')]
+        self.assertEqual(len(set(ids)), 3)
+        self.assertEqual(tsynth_queue.claim_next(self.queue_dir, 'w2'), (None, None))
+        self.assertEqual(tsynth_queue.count(self.queue_dir, tsynth_queue.CLAIMED), 3)
+
+    def test_renew_extends_lease(self):
+        self.enqueue(1)
+        claim, _ = tsynth_queue.claim_next(self.queue_dir, 'w1')
+        os.utime(claim.path, (time.time() - 100, time.time() - 100))
+        self.assertTrue(claim.renew())
+        self.assertEqual(tsynth_queue.recover_expired(self.queue_dir, lease=50), [])
+
+    def test_expired_claim_goes_back_to_pending(self):
+        self.enqueue(2)
+        stale, _ = tsynth_queue.claim_next(self.queue_dir, 'crashed')
+        fresh, _ = tsynth_queue.claim_next(self.queue_dir, 'alive')
+        os.utime(stale.path, (time.time() - 100, time.time() - 100))
+        self.assertEqual(tsynth_queue.recover_expired(self.queue_dir, lease=50), [stale.job_id])
+        self.assertFalse(stale.renew())  # lost - worker must stop the job
+        self.assertTrue(fresh.renew())
+        claim, _ = tsynth_queue.claim_next(self.queue_dir, 'other')
+        self.assertEqual(claim.job_id, stale.job_id)
+
+    def claim_with_hook(self, after_rename):
+        ''' claim_next with after_rename() run right after claim file is renamed into claimed/ - like other worker would '''
+        real_rename = os.rename
+        in_hook = []
+
+        def rename(src, dst):
+            real_rename(src, dst)
+            if not in_hook and os.sep + tsynth_queue.CLAIMED + os.sep in dst:
+                in_hook.append(dst)
+                after_rename()
+
+        with mock.patch.object(tsynth_queue.os, 'rename', rename):
+            return tsynth_queue.claim_next(self.queue_dir, 'w1')
+
+    def age_pending(self, seconds):
+        pending_dir = os.path.join(self.queue_dir, tsynth_queue.PENDING)
+        for name in os.listdir(pending_dir):
+            os.utime(os.path.join(pending_dir, name), (time.time() - seconds, time.time() - seconds))
+
+    def test_old_pending_job_is_not_expired_when_claimed(self):
+        ''' queue enqueued long before workers start - fresh claim must not look expired to other worker '''
+        self.enqueue(1)
+        self.age_pending(1000)
+        recovered = []
+        claim, job = self.claim_with_hook(lambda: recovered.extend(tsynth_queue.recover_expired(self.queue_dir, lease=120)))
+        self.assertEqual(recovered, [])
+        self.assertIsNotNone(claim)
+        self.assertTrue(claim.renew())
+
+    def test_claim_recovered_right_after_rename(self):
+        ''' other worker moved claim back to pending before it was touched (eg. clock skew) - no crash, job stays claimable '''
+        self.enqueue(1)
+
+        def recover_all():
+            tsynth_queue.recover_expired(self.queue_dir, lease=-1)
+
+        self.assertEqual(self.claim_with_hook(recover_all), (None, None))
+        self.assertEqual(tsynth_queue.count(self.queue_dir, tsynth_queue.PENDING), 1)
+        self.assertIsNotNone(tsynth_queue.claim_next(self.queue_dir, 'w2')[0])
+
+    def test_finish_moves_job(self):
+        self.enqueue(2)
+        for status, sub_dir in ((tsynth_jobs.DONE, tsynth_queue.DONE), (tsynth_jobs.FAILED, tsynth_queue.FAILED)):
+            claim, _ = tsynth_queue.claim_next(self.queue_dir, 'w1')
+            claim.finish(status, 'error text')
+            with open(os.path.join(self.queue_dir, sub_dir, claim.job_id + '.json')) as f:
+                self.assertEqual(json.load(f)['result'], {'status': status, 'error': 'error text', 'worker': 'w1'})
+        self.assertEqual(tsynth_queue.count(self.queue_dir, tsynth_queue.CLAIMED), 0)
+
+
+class TestWorkers(QueueTestCase):
+    def test_workers_drain_queue_exactly_once(self):
+        self.enqueue(12)
+        stale, _ = tsynth_queue.claim_next(self.queue_dir, 'crashed-host')  # worker that died mid job
+        os.utime(stale.path, (time.time() - 100, time.time() - 100))
+        exe = os.path.join(self.dir, 'fake_ts')
+        with open(exe, 'w') as f:
+            f.write(f'#!{sys.executable}\n' + FAKE_EXE)
+        os.chmod(exe, 0o755)
+        workers = [subprocess.Popen([sys.executable, os.path.join(REPO_DIR, 'tsynth_queue.py'), 'work', self.queue_dir, '--exe', exe,
+                                     '-j', '2', '--lease', '5', '--worker-id', f'w{i}'], stdout=subprocess.DEVNULL)
+                   for i in range(3)]
+        for worker in workers:
+            self.assertEqual(worker.wait(60), 0)
+
+        with open(self.source + '.runs') as f:
+            runs = f.read().split()
+        outputs = [os.path.join(self.dir, 'out', f'{i}.png') for i in range(12)]
+        self.assertEqual(sorted(os.path.basename(run) for run in runs), sorted(os.path.basename(out)[:-4] + '.tsynth-tmp.png' for out in outputs))
+        self.assertTrue(all(os.path.isfile(out) for out in outputs))
+        self.assertEqual(tsynth_queue.count(self.queue_dir, tsynth_queue.DONE), 12)
+        for sub_dir in (tsynth_queue.PENDING, tsynth_queue.CLAIMED, tsynth_queue.FAILED):
+            self.assertEqual(tsynth_queue.count(self.queue_dir, sub_dir), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
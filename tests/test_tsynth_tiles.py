@@ -0,0 +1,121 @@
+# Run from repo root: python -m unittest discover -s tests
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tsynth_png
+import tsynth_tiles
+
+
+class FakeRunner:
+    ''' Stands in for scheduler and blender timer: "runs" tile jobs by writing solid gray tiles, calls deferred callbacks '''
+    def __init__(self):
+        self.jobs = []  # (command, out_path, callback, wait_for)
+        self.deferred = []
+        self.commands = []
+
+    def submit(self, command, out_path, callback, wait_for=()):
+        self.jobs.append((command, out_path, callback, list(wait_for)))
+
+    def defer(self, future, callback):
+        self.deferred.append((future, callback))
+
+    def run(self, limit=30):
+        end = time.time() + limit
+        while self.jobs or self.deferred:
+            if time.time() > end:
+                raise AssertionError('tiled synthesis did not finish in time')
+            for job in self.jobs[:]:
+                command, out_path, callback, wait_for = job
+                if not all(future.done() for future in wait_for):
+                    continue
+                self.jobs.remove(job)
+                if any(future.exception() is not None for future in wait_for):
+                    callback(False)
+                    continue
+                self.commands.append(command)
+                width, height = (int(v) for v in command[command.index('--out-size') + 1].split('x'))
+                tsynth_png.encode_png(np.full((height, width, 4), 0.5, dtype=np.float32), out_path)
+                callback(True)
+            for item in self.deferred[:]:
+                if item[0].done():
+                    self.deferred.remove(item)
+                    item[1](item[0])
+            time.sleep(0.01)
+
+
+class TestTiledSynthesis(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.out_path = os.path.join(self.dir, 'out.png')
+        self.finished = []
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def make(self, **kwargs):
+        return tsynth_tiles.TiledSynthesis('ts', {}, ['in.png'], None, 300, 200, self.out_path, os.path.join(self.dir, 'tiles'),
+                                           tile_size=128, overlap=16, on_finished=self.finished.append, **kwargs)
+
+    def check_output(self, tiled):
+        self.assertEqual(self.finished, [True])
+        pixels = tsynth_png.decode_png(self.out_path)
+        self.assertEqual(pixels.shape, (200, 300, 4))
+        np.testing.assert_allclose(pixels[..., :3], 128 / 255, atol=1 / 255)
+
+    def test_tile_positions_cover_output(self):
+        self.assertEqual(tsynth_tiles.tile_positions(300, 128, 16), [0, 86, 172])
+        self.assertEqual(tsynth_tiles.tile_positions(100, 128, 16), [0])
+
+    def test_inline(self):
+        runner = FakeRunner()
+        tiled = self.make()
+        tiled.start(runner.submit)
+        runner.run()
+        self.check_output(tiled)
+        self.assertEqual(len(runner.commands), len(tiled.tiles))
+        inpaint = [command for command in runner.commands if '--inpaint' in command]
+        self.assertEqual(len(inpaint), len(tiled.tiles) - 1)
+        self.assertTrue(all(os.path.isfile(command[command.index('--inpaint') + 1]) for command in inpaint))
+
+    def test_file_work_off_caller_thread(self):
+        main_thread = threading.get_ident()
+        threads = {}
+        for name in ('write_tile_inputs', 'blend'):
+            original = getattr(tsynth_tiles.TiledSynthesis, name)
+
+            def wrapper(self, *args, name=name, original=original):
+                threads.setdefault(name, set()).add(threading.get_ident())
+                return original(self, *args)
+            self.addCleanup(setattr, tsynth_tiles.TiledSynthesis, name, original)
+            setattr(tsynth_tiles.TiledSynthesis, name, wrapper)
+
+        runner = FakeRunner()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            tiled = self.make(executor=executor, defer=runner.defer)
+            tiled.start(runner.submit)
+            runner.run()
+        self.check_output(tiled)
+        self.assertNotIn(main_thread, threads['write_tile_inputs'])
+        self.assertNotIn(main_thread, threads['blend'])
+
+    def test_failed_tile_input_fails_run(self):
+        runner = FakeRunner()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            tiled = self.make(executor=executor, defer=runner.defer, reader=lambda path: None)
+            tiled.start(runner.submit)
+            runner.run()
+        self.assertEqual(self.finished, [False])
+        self.assertFalse(os.path.exists(self.out_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
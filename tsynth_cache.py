@@ -0,0 +1,112 @@
+'''
+Copyright (C) 2019 JOSECONSCO
+Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simple Asset Manager)
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+# Content addressed cache of texture-synthesis outputs. No bpy in here.
+
+import os
+import shutil
+import hashlib
+
+FILE_DIGESTS = {}  # (path, mtime_ns, size) -> digest, so unchanged inputs are hashed only once per session
+
+
+def file_digest(file_path):
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    digest = FILE_DIGESTS.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        digest = FILE_DIGESTS[key] = h.hexdigest()
+    return digest
+
+
+class ResultCache:
+    ''' Generated images stored as <directory>/<key><ext>. Least recently used ones are removed when cache gets over max_size (bytes) '''
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+
+    @staticmethod
+    def make_key(command, out_path):
+        ''' Hash of normalized command line: executable path and output path are skipped, files (input image, guides, masks) are replaced by hash of their content '''
+        h = hashlib.sha256()
+        h.update(os.path.splitext(out_path)[1].lower().encode())
+        skip_next = False
+        for arg in command[1:]:
+            if skip_next:  # output path
+                skip_next = False
+                continue
+            if arg in ('--out', '-o'):
+                skip_next = True
+                continue
+            if os.path.isfile(arg):
+                h.update(b'file:' + file_digest(arg).encode())
+            else:
+                h.update(arg.encode())
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def entry_path(self, key, out_path):
+        return os.path.join(self.directory, key + os.path.splitext(out_path)[1].lower())
+
+    @staticmethod
+    def _copy(src, dst):
+        tmp = dst + '.tsynth-copy'
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+
+    def restore(self, key, out_path):
+        ''' Copy cached result to out_path. Returns False on cache miss '''
+        entry = self.entry_path(key, out_path)
+        if not os.path.isfile(entry):
+            return False
+        try:
+            self._copy(entry, out_path)
+        except OSError as e:
+            print(f'Could not restore {out_path} from cache: {e}')
+            return False
+        os.utime(entry)  # mtime marks last use
+        return True
+
+    def store(self, key, out_path):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._copy(out_path, self.entry_path(key, out_path))
+        except OSError as e:
+            print(f'Could not store {out_path} in cache: {e}')
+            return
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
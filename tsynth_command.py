@@ -0,0 +1,228 @@
+'''
+Copyright (C) 2019 JOSECONSCO
+Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simple Asset Manager)
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+# texture-synthesis command lines from plain settings dicts. No bpy in here - used by add-on operator and by headless batch runs:
+#   python tsynth_command.py --exe texture-synthesis spec.json
+#   python tsynth_command.py --exe texture-synthesis --dir imgs --out-dir out --out-size 1024x1024 --seed 3 --jobs 4
+# Without --out-dir results go to imgs/tsynth_out. Writing into imgs itself would overwrite png sources - needs --overwrite.
+#
+# Job spec json:
+#   {"exe": "texture-synthesis", "max_jobs": 4, "timeout": 0,
+#    "defaults": {"k_neighs": 20, "out_size": "1024x1024"},
+#    "jobs": [{"inputs": ["imgs/1.jpg"], "out": "out/1.png", "seed": 5},
+#             {"gen_type": "inpaint", "inputs": ["imgs/3.jpg"], "to_guide": "imgs/3_mask.png", "out": "out/3.png"}]}
+# Settings use TextSynth_Settings property names, so settings exported from add-on can be used as they are.
+
+import os
+import sys
+import json
+import time
+import argparse
+
+try:
+    from . import tsynth_jobs
+    from . import get_image_size
+    from . import tsynth_memory
+except ImportError:  # run as script, outside of blender
+    import tsynth_jobs
+    import get_image_size
+    import tsynth_memory
+
+DEFAULT_SETTINGS = {
+    'gen_type': 'generate',
+    'seed': 1,
+    'rand_init': 1,
+    'k_neighs': 50,
+    'cauchy': 1.0,
+    'backtrack_pct': 50,  # percent, like in add-on UI
+    'backtrack_stages': 5,
+    'tiling': True,
+    'alpha': 0.8,
+}
+GEN_TYPES = ('generate', 'multi-generate', 'guided-synthesis', 'transfer-style', 'inpaint')
+DEFAULT_OUT_SUBDIR = 'tsynth_out'
+
+
+def build_command(exe, settings, out_path, inputs, in_size=None, out_size=None, from_guide=None, to_guide=None):
+    ''' Command line list for one run. Sizes are strings like '512x512', None leaves texture-synthesis default.
+    Raises ValueError if gen_type is unknown, or it needs input or guide that is missing '''
+    settings = dict(DEFAULT_SETTINGS, **settings)
+    gen_type = settings['gen_type']
+    if gen_type not in GEN_TYPES:
+        raise ValueError(f'Unknown gen_type {gen_type!r}, expected one of {", ".join(GEN_TYPES)}')
+    if not inputs:
+        raise ValueError('No input image given')
+    command = [exe, "--out", out_path]
+    if out_size:
+        command += ["--out-size", out_size]
+    command += ["--seed", str(settings['seed']),
+                "--rand-init", str(settings['rand_init']),
+                "--k-neighs", str(settings['k_neighs']),
+                "--cauchy", str(settings['cauchy']),
+                "--backtrack-pct", str(settings['backtrack_pct']/100),
+                "--backtrack-stages", str(settings['backtrack_stages'])]
+    if in_size:
+        command += ["--in-size", in_size]
+    if settings['tiling']:
+        command.append('--tiling')
+
+    if gen_type == 'generate':
+        command.extend(['generate', inputs[0]])
+
+    elif gen_type == 'multi-generate':
+        command.extend(['generate'] + list(inputs))
+
+    elif gen_type == 'guided-synthesis':
+        if not from_guide:
+            raise ValueError('From guide image is empty. Canceling')
+        if not to_guide:
+            raise ValueError('To guide image is empty. Canceling')
+        command.extend(['generate',
+                        '--target-guide', to_guide,
+                        '--guides', from_guide,
+                        '--', inputs[0]])
+
+    elif gen_type == 'transfer-style':
+        if not to_guide:
+            raise ValueError('To guide image is empty!. Canceling')
+        command[1:1] = ['--alpha', str(settings['alpha'])]  # add at begning after program name
+        command.extend(['transfer-style',
+                        '--style', inputs[0],
+                        '--guide', to_guide])
+
+    elif gen_type == 'inpaint':
+        if not to_guide:
+            raise ValueError('To guide image is empty. Canceling')
+        command.extend(['--inpaint', to_guide,
+                        'generate'] + list(inputs))  # first example is inpainted, others are only sampled from
+    return command
+
+
+def jobs_from_spec(spec, exe=None, base_dir=''):
+    ''' [(command, out_path)] for json job spec. Relative paths are relative to base_dir (spec file location) '''
+    exe = exe or spec.get('exe')
+    if not exe:
+        raise ValueError('texture-synthesis executable not given - use "exe" in spec or --exe')
+    defaults = spec.get('defaults', {})
+
+    def path(value):
+        return os.path.join(base_dir, value) if value else value
+
+    jobs = []
+    for i, job in enumerate(spec.get('jobs', [])):
+        job = dict(defaults, **job)
+        if 'out' not in job:
+            raise ValueError(f'Job {i} has no "out" path')
+        inputs = job.get('inputs') or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        out_path = path(job['out'])
+        command = build_command(exe, job, out_path, [path(p) for p in inputs], job.get('in_size'), job.get('out_size'),
+                                path(job.get('from_guide')), path(job.get('to_guide')))
+        jobs.append((command, out_path))
+    return jobs
+
+
+def jobs_from_directory(exe, directory, out_dir, settings, in_size=None, out_size=None, overwrite=False):
+    ''' One 'generate' run per image in directory, like Shift+Click in add-on. Output is <out_dir>/<image name>.png.
+    Raises ValueError if out_dir is directory itself - png sources would be overwritten - unless overwrite is True '''
+    if not overwrite and os.path.realpath(out_dir) == os.path.realpath(directory):
+        raise ValueError(f'Output directory is input directory {directory} - source images would be overwritten. Use other --out-dir, or --overwrite')
+    jobs = []
+    for file_name in sorted(os.listdir(directory)):
+        if os.path.splitext(file_name)[1].lower() not in get_image_size.IMAGE_EXTENSIONS:
+            continue
+        out_path = os.path.join(out_dir, os.path.splitext(file_name)[0] + '.png')  # texture_synthesis.exe only works with png
+        jobs.append((build_command(exe, dict(settings, gen_type='generate'), out_path, [os.path.join(directory, file_name)], in_size, out_size), out_path))
+    return jobs
+
+
+def run_jobs(jobs, max_jobs=2, timeout=0, batch_name='batch', poll_interval=0.2, partition_cores=False, ram_budget_mb=0):
+    ''' Run jobs through JobScheduler until all are finished. Returns SynthBatch '''
+    scheduler = tsynth_jobs.JobScheduler(max_jobs, partition_cores, tsynth_memory.budget_mb(ram_budget_mb))
+    batch = tsynth_jobs.SynthBatch(batch_name)
+    for command, out_path in jobs:
+        os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+        scheduler.submit(command, out_path, batch, timeout=timeout)
+    try:
+        while scheduler.tick():
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print('Interrupted - killing running jobs')
+        scheduler.cancel_all()
+    return batch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run texture-synthesis jobs without blender')
+    parser.add_argument('spec', nargs='?', help='json job spec')
+    parser.add_argument('--exe', help='texture-synthesis executable (overrides "exe" in spec)')
+    parser.add_argument('--dir', help='generate texture for every image in this directory')
+    parser.add_argument('--out-dir', help=f'output directory for --dir mode (default: {DEFAULT_OUT_SUBDIR} in input directory)')
+    parser.add_argument('--overwrite', action='store_true', help='allow --out-dir to be input directory - png sources get replaced by results')
+    parser.add_argument('-j', '--jobs', type=int, help='processes running at once (default: "max_jobs" from spec or 2)')
+    parser.add_argument('--timeout', type=int, help='kill job after this many seconds, 0 - no limit')
+    parser.add_argument('--partition-cores', action='store_true', help='give each running job its own cores (--threads and CPU affinity)')
+    parser.add_argument('--ram-budget', type=int, default=0, metavar='MB', help='start jobs only while their estimated peak memory fits (default: 75%% of physical memory)')
+    parser.add_argument('--in-size')
+    parser.add_argument('--out-size')
+    for key, value in DEFAULT_SETTINGS.items():
+        if key == 'gen_type':
+            continue
+        option = '--' + key.replace('_', '-')
+        if isinstance(value, bool):
+            parser.add_argument(option, dest=key, type=lambda v: v.lower() in ('1', 'true', 'yes', 'on'), metavar='BOOL')
+        else:
+            parser.add_argument(option, dest=key, type=type(value))
+    args = parser.parse_args(argv)
+
+    if bool(args.spec) == bool(args.dir):
+        parser.error('give either json spec or --dir')
+    settings = {key: getattr(args, key) for key in DEFAULT_SETTINGS if key != 'gen_type' and getattr(args, key) is not None}
+    try:
+        if args.spec:
+            with open(args.spec, encoding='utf-8') as f:
+                spec = json.load(f)
+            spec['defaults'] = dict(spec.get('defaults', {}), **settings)  # command line wins
+            if args.in_size or args.out_size:
+                spec['defaults'].update({k: v for k, v in (('in_size', args.in_size), ('out_size', args.out_size)) if v})
+            jobs = jobs_from_spec(spec, args.exe, os.path.dirname(os.path.abspath(args.spec)))
+            name = os.path.basename(args.spec)
+        else:
+            if not args.exe:
+                parser.error('--exe is required with --dir')
+            out_dir = args.out_dir or os.path.join(args.dir, DEFAULT_OUT_SUBDIR)
+            jobs = jobs_from_directory(args.exe, args.dir, out_dir, settings, args.in_size, args.out_size, args.overwrite)
+            name = os.path.basename(os.path.normpath(args.dir))
+            spec = {}
+    except (OSError, ValueError) as e:
+        print(f'Error: {e}')
+        return 2
+    if not jobs:
+        print('Nothing to do')
+        return 0
+
+    max_jobs = args.jobs or spec.get('max_jobs', 2)
+    timeout = args.timeout if args.timeout is not None else spec.get('timeout', 0)
+    print(f'Running {len(jobs)} jobs, {max_jobs} at once')
+    batch = run_jobs(jobs, max_jobs, timeout, name, partition_cores=args.partition_cores, ram_budget_mb=args.ram_budget)  # scheduler prints batch summary
+    return 0 if batch.count(tsynth_jobs.DONE) == len(batch.jobs) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
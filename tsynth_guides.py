@@ -0,0 +1,90 @@
+'''
+Copyright (C) 2019 JOSECONSCO
+Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simple Asset Manager)
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+# Guide and mask images are written to disk only when their pixels changed. Each image has one file in cache dir, reused by every run.
+# Pixels are read on main thread, PNG is encoded on worker thread - jobs using guide wait for its future (see pending_exports())
+
+import bpy
+import os
+import hashlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from .utils import get_cache_dir
+from . import tsynth_png
+
+GUIDE_HASHES = {}  # guide file path -> hash of pixels saved there
+PENDING_EXPORTS = {}  # guide file path -> (hash of pixels, Future of encode)
+EXECUTOR = None
+
+
+def get_guide_path(img):
+    return os.path.join(get_cache_dir('guides'), bpy.path.clean_name(img.name) + '.png')
+
+
+def read_pixels(img):
+    width, height = img.size
+    pixels = np.empty(width * height * img.channels, dtype=np.float32)
+    img.pixels.foreach_get(pixels)
+    pixels = pixels.reshape(height, width, img.channels)
+    if img.channels != 4:  # blender gives 4 channels for almost everything, but better be sure
+        rgba = np.ones((height, width, 4), dtype=np.float32)
+        rgba[..., :3] = pixels[..., :3] if img.channels >= 3 else pixels[..., :1]
+        pixels = rgba
+    return pixels
+
+
+def export_guide(img):
+    ''' Path of file with current pixels of img. Unmodified image that has its file on disk is used as is.
+    Painted one is encoded to guides cache on worker thread - unless hash shows pixels are same as in last written file '''
+    global EXECUTOR
+    if img.source == 'FILE' and not img.is_dirty and not img.packed_file:
+        file_path = bpy.path.abspath(img.filepath)
+        if os.path.isfile(file_path):
+            return file_path
+    guide_path = get_guide_path(img)
+    pixels = read_pixels(img)
+    pixels_key = hashlib.sha1(pixels).hexdigest()
+    pending = PENDING_EXPORTS.get(guide_path)
+    if pending is not None and pending[0] == pixels_key:
+        return guide_path
+    if pending is None and GUIDE_HASHES.get(guide_path) == pixels_key and os.path.isfile(guide_path):
+        return guide_path
+    if EXECUTOR is None:
+        EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tsynth_guides')  # one worker - writes of same file stay in order
+    future = EXECUTOR.submit(tsynth_png.encode_png, pixels, guide_path)
+    PENDING_EXPORTS[guide_path] = (pixels_key, future)
+    GUIDE_HASHES.pop(guide_path, None)
+    return guide_path
+
+
+def pending_exports(command):
+    ''' Futures of guide writes that command still has to wait for. Finished writes are moved to GUIDE_HASHES '''
+    for guide_path, (pixels_key, future) in list(PENDING_EXPORTS.items()):
+        if future.done():
+            del PENDING_EXPORTS[guide_path]
+            if future.exception() is None:
+                GUIDE_HASHES[guide_path] = pixels_key
+    return [PENDING_EXPORTS[arg][1] for arg in command if arg in PENDING_EXPORTS]
+
+
+def shutdown():
+    global EXECUTOR
+    PENDING_EXPORTS.clear()
+    if EXECUTOR is not None:
+        EXECUTOR.shutdown(wait=False)
+        EXECUTOR = None
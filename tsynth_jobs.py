@@ -0,0 +1,467 @@
+'''
+Copyright (C) 2019 JOSECONSCO
+Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simple Asset Manager)
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+# Job scheduler for texture-synthesis processes. No bpy in here - main_operators drives tick() from bpy.app.timers.
+
+import os
+import re
+import sys
+import time
+import struct
+import threading
+import subprocess
+from collections import deque
+
+try:
+    import fcntl
+    import termios
+except ImportError:  # windows
+    termios = None
+
+try:
+    from . import get_image_size
+    from . import tsynth_memory
+except ImportError:  # run as script, outside of blender
+    import get_image_size
+    import tsynth_memory
+
+QUEUED = 'QUEUED'
+RUNNING = 'RUNNING'
+DONE = 'DONE'
+FAILED = 'FAILED'
+CANCELLED = 'CANCELLED'
+TIMED_OUT = 'TIMED_OUT'
+CACHED = 'CACHED'  # job.restore() put result in place - process was not run
+
+LIVE_STATES = (QUEUED, RUNNING)
+SUCCEEDED = (DONE, CACHED)
+
+# texture-synthesis progress bars (indicatif) look like: '[00:00:03] ####---- 45/100 Total' and '... 7/100 Stage 3'
+PROGRESS_BAR_RE = re.compile(r'(\d+)\s*/\s*(\d+)\s+(Total|Stage\s*\d+)', re.IGNORECASE)
+PERCENT_RE = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+
+PIXELS_PER_THREAD = 128 * 128  # below that extra threads of one process mostly wait - small images get narrow jobs
+DEFAULT_PIXELS = 512 * 512  # when output size can not be told from command
+
+
+class JobProgress:
+    ''' Progress parsed from child output. Fed from reader threads, read from main thread '''
+    def __init__(self):
+        self.stage = ''
+        self.stage_percent = None
+        self.percent = None  # total
+        self.last_output_time = None
+        self.stderr_tail = deque(maxlen=40)
+
+    def feed(self, line, is_stderr):
+        line = ANSI_ESCAPE_RE.sub('', line).strip()
+        if not line:
+            return
+        self.last_output_time = time.time()
+        if is_stderr:
+            self.stderr_tail.append(line)
+        bars = PROGRESS_BAR_RE.findall(line)
+        for pos, length, label in bars:
+            percent = 100.0 * int(pos) / max(int(length), 1)
+            if label.lower() == 'total':
+                self.percent = percent
+            else:
+                self.stage = label
+                self.stage_percent = percent
+        if not bars:
+            match = PERCENT_RE.search(line)
+            if match:
+                self.percent = min(100.0, float(match.group(1)))
+
+
+def read_stream(stream, progress, is_stderr):
+    ''' Reader thread body - blocks on pipe so main thread never does. Progress bars redraw line with carriage return, so split on it too '''
+    pending = b''
+    while True:
+        try:
+            chunk = stream.read1(4096)
+        except OSError:  # pseudo terminal gives EIO instead of EOF once child closed it
+            chunk = b''
+        if not chunk:
+            break
+        *lines, pending = re.split(rb'[\r\n]', pending + chunk)
+        for line in lines:
+            progress.feed(line.decode('utf-8', errors='replace'), is_stderr)
+    progress.feed(pending.decode('utf-8', errors='replace'), is_stderr)
+    stream.close()
+
+
+def spawn(command):
+    ''' Popen with stdout on pipe and stderr on pseudo terminal. texture-synthesis draws its progress bars with indicatif,
+    which draws nothing when stderr is not a terminal - so on plain pipe progress would only be known once process exits.
+    On windows there is no pty, there progress shows only if child prints it anyway '''
+    if termios is None or not hasattr(os, 'openpty'):
+        return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    master, slave = os.openpty()
+    try:
+        fcntl.ioctl(slave, termios.TIOCSWINSZ, struct.pack('HHHH', 24, 160, 0, 0))  # new pty has 0 columns - bars would be cut to nothing
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=slave)
+    except BaseException:
+        os.close(master)
+        raise
+    finally:
+        os.close(slave)  # child has its copy - master reads EIO once child exits
+    proc.stderr = open(master, 'rb')
+    return proc
+
+
+class SynthJob:
+    def __init__(self, command, out_path, batch=None, timeout=0, on_done=None, wait_for=()):
+        self.command = command
+        self.out_path = out_path
+        self.batch = batch
+        self.timeout = timeout  # seconds, 0 - no limit
+        self.on_done = on_done  # called with job, from tick(), once job is not live anymore
+        self.wait_for = list(wait_for)  # futures (eg. guide images being written) that have to finish before process starts
+        self.restore = None  # callable(job), called once wait_for is done. True - out_path already has result (eg. from result cache), skip process
+        self.status = QUEUED
+        self.proc = None
+        self.returncode = None
+        self.start_time = None
+        self.end_time = None
+        self.error = ''
+        self.meta = {}  # settings etc. - written to telemetry with resource usage
+        self.rusage = None  # resource usage of reaped child, posix only
+        self.progress = JobProgress()
+        self.cpus = []  # cores job is pinned to, when scheduler partitions cores
+        self.memory_features = None  # (example_pixels, out_pixels, k_neighs) - see tsynth_memory
+        self.est_rss_mb = None
+        self._readers = []
+        # texture-synthesis writes to tmp_path, which is renamed to out_path only after process exits with 0.
+        # So out_path never contains half written image. Keep extension - it decides output format
+        base, ext = os.path.splitext(out_path)
+        self.tmp_path = f'{base}.tsynth-tmp{ext}'
+        self.command = list(command)
+        for i, arg in enumerate(self.command[:-1]):
+            if arg in ('--out', '-o'):  # only output option - input may have same path when it is overridden
+                self.command[i + 1] = self.tmp_path
+
+    def start_readers(self):
+        for stream, is_stderr in ((self.proc.stdout, False), (self.proc.stderr, True)):
+            reader = threading.Thread(target=read_stream, args=(stream, self.progress, is_stderr), daemon=True)
+            reader.start()
+            self._readers.append(reader)
+
+    def join_readers(self):
+        ''' Process already exited, so pipes are at EOF - unless it left grandchild holding them. Do not wait long for that '''
+        for reader in self._readers:
+            reader.join(0.5)
+        self._readers = []
+        return '\n'.join(self.progress.stderr_tail)
+
+    def poll(self):
+        ''' Like Popen.poll(), but on posix reaps child with os.wait4, to get its CPU time and peak memory '''
+        if not hasattr(os, 'wait4') or self.proc.returncode is not None:
+            return self.proc.poll()
+        try:
+            pid, wait_status, rusage = os.wait4(self.proc.pid, os.WNOHANG)
+        except ChildProcessError:  # already reaped
+            return self.proc.poll()
+        if pid == 0:
+            return None
+        self.rusage = rusage
+        if os.WIFSIGNALED(wait_status):
+            self.proc.returncode = -os.WTERMSIG(wait_status)
+        else:
+            self.proc.returncode = os.WEXITSTATUS(wait_status)
+        return self.proc.returncode
+
+    def resource_usage(self):
+        ''' Dict with wall_time, user_time, sys_time (sec) and peak_rss_mb. CPU and memory are None if not measured '''
+        usage = {'wall_time': round(self.elapsed, 3), 'user_time': None, 'sys_time': None, 'peak_rss_mb': None, 'threads': len(self.cpus) or None}
+        if self.rusage is not None:
+            maxrss = self.rusage.ru_maxrss / 1024  # kB on linux
+            if sys.platform == 'darwin':  # bytes on mac
+                maxrss /= 1024
+            usage.update(user_time=round(self.rusage.ru_utime, 3), sys_time=round(self.rusage.ru_stime, 3), peak_rss_mb=round(maxrss, 1))
+        if self.memory_features is not None:
+            example_pixels, out_pixels, k_neighs = self.memory_features
+            usage['memory'] = {'example_pixels': example_pixels, 'out_pixels': out_pixels, 'k_neighs': k_neighs, 'est_rss_mb': round(self.est_rss_mb, 1)}
+        return usage
+
+    @property
+    def eta(self):
+        ''' Seconds left, estimated from total progress. None if child does not report progress '''
+        percent = self.progress.percent
+        if self.status != RUNNING or not percent:
+            return None
+        return self.elapsed * (100.0 - percent) / percent
+
+    def progress_text(self):
+        text = f'{os.path.basename(self.out_path)}: {self.elapsed:.0f}s'
+        progress = self.progress
+        if progress.stage:
+            text += f', {progress.stage} {progress.stage_percent:.0f}%'
+        if progress.percent is not None:
+            text += f', total {progress.percent:.0f}%'
+        eta = self.eta
+        if eta is not None:
+            text += f', ETA {eta:.0f}s'
+        if progress.last_output_time is None:
+            text += ', no output yet'
+        elif time.time() - progress.last_output_time > 30:
+            text += f', silent for {time.time() - progress.last_output_time:.0f}s'
+        return text
+
+    def remove_tmp_output(self):
+        if os.path.isfile(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    @property
+    def pixels(self):
+        ''' Output pixel count, from --out-size, else from size of input image (get_image_size) '''
+        for option in ('--out-size', '--in-size'):
+            if option in self.command[:-1]:
+                size = self.command[self.command.index(option) + 1]
+                try:
+                    width, _, height = size.partition('x')
+                    return int(width) * int(height or width)
+                except ValueError:
+                    pass
+        try:
+            width, height = get_image_size.get_image_size_cached(self.command[-1])
+            return width * height
+        except (OSError, get_image_size.UnknownImageFormat):
+            return DEFAULT_PIXELS
+
+    @property
+    def ready(self):
+        return all(future.done() for future in self.wait_for)
+
+    @property
+    def timed_out(self):
+        return self.timeout > 0 and self.elapsed > self.timeout
+
+    @property
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.time()) - self.start_time
+
+    def __repr__(self):
+        return f'<SynthJob {self.status} {self.out_path}>'
+
+
+class SynthBatch:
+    ''' Jobs submitted together (eg. Shift+Click on whole folder). Reports throughput once all jobs are finished '''
+    def __init__(self, name):
+        self.name = name
+        self.jobs = []
+        self.start_time = time.time()
+        self.end_time = None
+
+    @property
+    def finished(self):
+        return all(job.status not in LIVE_STATES for job in self.jobs)
+
+    def count(self, status):
+        return sum(1 for job in self.jobs if job.status == status)
+
+    def summary(self):
+        wall_time = (self.end_time or time.time()) - self.start_time
+        done = self.count(DONE) + self.count(CACHED)
+        per_min = done / wall_time * 60 if wall_time > 0 else 0.0
+        return (f'Batch {self.name}: {done}/{len(self.jobs)} images generated in {wall_time:.1f} sec '
+                f'({per_min:.1f} img/min), from cache: {self.count(CACHED)}, failed: {self.count(FAILED)}, timed out: {self.count(TIMED_OUT)}, cancelled: {self.count(CANCELLED)}')
+
+
+class JobScheduler:
+    ''' FIFO queue of texture-synthesis processes, with at most max_jobs of them running at once.
+    With partition_cores each job gets own set of cores: --threads of that count, and on linux CPU affinity pinned to them.
+    With ram_budget_mb (0 - no limit) next job starts only if estimated peak memory of it and running jobs fits. First job always starts '''
+    def __init__(self, max_jobs=2, partition_cores=False, ram_budget_mb=0):
+        self.max_jobs = max_jobs
+        self.partition_cores = partition_cores
+        self.ram_budget_mb = ram_budget_mb
+        self.memory_model = tsynth_memory.MemoryModel()
+        self.waiting_for_ram = False
+        self.cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+        self.queue = deque()
+        self.running = []
+        self.batches = []
+        self.jobs = {}  # out_path -> last job writing to it
+
+    def submit(self, command, out_path, batch=None, timeout=0, on_done=None, wait_for=()):
+        ''' Queue new job. Live job that writes to same out_path gets cancelled - its output would be overridden anyway.
+        Job is not started before all wait_for futures are done '''
+        old_job = self.jobs.get(out_path)
+        if old_job is not None and old_job.status in LIVE_STATES:
+            self.cancel(old_job)
+        job = SynthJob(command, out_path, batch, timeout, on_done, wait_for)
+        self.jobs[out_path] = job
+        if batch is not None:
+            batch.jobs.append(job)
+            if batch not in self.batches:
+                self.batches.append(batch)
+        self.queue.append(job)
+        return job
+
+    def free_cpus(self):
+        used = {cpu for job in self.running for cpu in job.cpus}
+        return [cpu for cpu in self.cpus if cpu not in used]
+
+    def job_width(self, job, free_cpus, ready_count):
+        ''' Cores for job: free ones split evenly between jobs that can still start now - short queue gives few wide jobs, long one many narrow.
+        Small images are capped at one thread per PIXELS_PER_THREAD '''
+        slots = max(1, min(max(1, self.max_jobs) - len(self.running), ready_count))
+        share = -(-len(free_cpus) // slots)  # ceil
+        return max(1, min(share, job.pixels // PIXELS_PER_THREAD, len(free_cpus)))
+
+    def estimate_rss_mb(self, job):
+        if job.memory_features is None:
+            job.memory_features = tsynth_memory.features_from_command(job.command)
+        job.est_rss_mb = self.memory_model.estimate_mb(job.memory_features)
+        return job.est_rss_mb
+
+    def fits_in_ram(self, job):
+        if self.ram_budget_mb <= 0 or not self.running:
+            return True
+        return sum(running.est_rss_mb for running in self.running) + self.estimate_rss_mb(job) <= self.ram_budget_mb
+
+    def popen(self, job):
+        if not job.cpus or not hasattr(os, 'sched_setaffinity'):  # windows, mac - thread count only
+            return spawn(job.command)
+        # child inherits affinity of thread that forks it - pin this thread just for spawn, no preexec_fn needed
+        own_cpus = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, job.cpus)
+        try:
+            return spawn(job.command)
+        finally:
+            os.sched_setaffinity(0, own_cpus)
+
+    def _start(self, job):
+        job.start_time = time.time()
+        errors = [str(future.exception()) for future in job.wait_for if future.cancelled() or future.exception() is not None]
+        if errors:
+            job.error = 'Preparing inputs failed: ' + '; '.join(errors)
+            self._finish(job, FAILED)
+            return
+        if job.restore is not None and job.restore(job):
+            self._finish(job, CACHED)
+            return
+        if job.cpus:
+            job.command[1:1] = ['--threads', str(len(job.cpus))]
+        print(job.command)
+        try:
+            job.proc = self.popen(job)
+        except OSError as e:
+            job.error = str(e)
+            print(f'Failed to start texture-synthesis for {job.out_path}: {e}')
+            self._finish(job, FAILED)
+            return
+        job.start_readers()
+        job.status = RUNNING
+        self.running.append(job)
+
+    def _finish(self, job, status):
+        job.end_time = time.time()
+        if job in self.running:
+            self.running.remove(job)
+        stderr = job.join_readers()
+        if status == DONE and job.rusage is not None:
+            self.memory_model.observe(job.memory_features, job.resource_usage()['peak_rss_mb'])
+        if status == DONE:
+            try:
+                os.replace(job.tmp_path, job.out_path)  # atomic
+            except OSError as e:
+                status = FAILED
+                job.error = f'Output was not written: {e}'
+        elif status == FAILED and not job.error:
+            job.error = stderr or f'texture-synthesis exited with code {job.returncode}'
+        if status != DONE:
+            job.remove_tmp_output()
+        job.status = status
+        if status == FAILED:
+            print(f'Generating {job.out_path} failed:\n{job.error}')
+        if job.on_done is not None:
+            try:
+                job.on_done(job)
+            except Exception as e:
+                print(f'Error while finishing job {job.out_path}: {e}')
+
+    def cancel(self, job, status=CANCELLED):
+        if job.status == QUEUED:
+            self.queue.remove(job)
+        elif job.status == RUNNING:
+            job.proc.kill()
+            job.proc.wait()
+        else:
+            return
+        self._finish(job, status)
+
+    def tick(self):
+        ''' Poll running processes and start queued ones. Never blocks. Returns True while there is work left '''
+        for job in self.running[:]:
+            returncode = job.poll()
+            if returncode is None:
+                if job.timed_out:
+                    print(f'Waited {job.timeout} sec for {job.out_path} to be generated. Killing texture-synthesis process')
+                    self.cancel(job, TIMED_OUT)
+                continue
+            job.returncode = returncode
+            self._finish(job, DONE if returncode == 0 else FAILED)
+
+        self.waiting_for_ram = False
+        while len(self.running) < max(1, self.max_jobs):
+            ready = [job for job in self.queue if job.ready]  # jobs still waiting for inputs do not block ones behind them
+            if not ready:
+                break
+            job = ready[0]
+            self.waiting_for_ram = not self.fits_in_ram(job)
+            if self.waiting_for_ram:  # FIFO - smaller jobs behind do not overtake, so big one is not starved
+                break
+            if self.partition_cores:
+                free_cpus = self.free_cpus()
+                if not free_cpus:  # wide jobs started while queue was short - wait for their cores
+                    break
+                job.cpus = free_cpus[:self.job_width(job, free_cpus, len(ready))]
+            self.queue.remove(job)
+            self.estimate_rss_mb(job)
+            self._start(job)
+
+        for batch in self.batches[:]:
+            if batch.finished:
+                batch.end_time = time.time()
+                print(batch.summary())
+                self.batches.remove(batch)
+        return bool(self.queue or self.running)
+
+    def cancel_all(self):
+        for job in list(self.queue) + self.running:
+            self.cancel(job)
+        self.tick()
+
+    def status_text(self):
+        if not self.queue and not self.running:
+            return ''
+        text = f'Running: {len(self.running)}, queued: {len(self.queue)}'
+        if self.waiting_for_ram and self.queue:
+            text += f' (waiting for RAM, {sum(job.est_rss_mb for job in self.running):.0f}/{self.ram_budget_mb:.0f} MB)'
+        for batch in self.batches:
+            finished = sum(1 for job in batch.jobs if job.status not in LIVE_STATES)
+            text += f' | {batch.name}: {finished}/{len(batch.jobs)}'
+        return text
+
+
+scheduler = JobScheduler()
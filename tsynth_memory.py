@@ -0,0 +1,152 @@
+'''
+Copyright (C) 2019 JOSECONSCO
+Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simple Asset Manager)
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+# Peak memory estimate of texture-synthesis runs, used by JobScheduler to keep total of running processes under RAM budget. No bpy in here.
+# Prior model: fixed cost + bytes per example pixel (image, pyramid, coordinate maps) + bytes per output pixel, growing with k_neighs
+# (candidate lists of every output pixel). Real binary differs between versions and platforms, so measured peak RSS of finished runs
+# corrects it: runs with same sizes and k_neighs reuse their measured peak, anything else is prior times measured/prior ratio of recent runs.
+
+import os
+from collections import deque
+
+try:
+    from . import get_image_size
+except ImportError:  # run as script, outside of blender
+    import get_image_size
+
+BASE_MB = 40.0
+BYTES_PER_EXAMPLE_PIXEL = 48.0
+BYTES_PER_OUT_PIXEL = 96.0
+BYTES_PER_OUT_PIXEL_NEIGHBOUR = 8.0
+DEFAULT_OUT_PIXELS = 500 * 500  # texture-synthesis default --out-size
+DEFAULT_K_NEIGHS = 50
+DEFAULT_BUDGET_FRACTION = 0.75  # of physical memory, when budget is not set - rest is left for blender and OS
+RATIO_PERCENTILE = 0.9  # over-estimating only delays jobs, under-estimating may get them OOM-killed
+MIN_RATIO, MAX_RATIO = 0.1, 10.0
+SUBCOMMANDS = ('generate', 'transfer-style')
+
+
+def parse_size(size):
+    ''' '512x256' -> 512 * 256 pixels, '512' -> 512 * 512. None if size can not be parsed '''
+    if not size:
+        return None
+    width, _, height = str(size).partition('x')
+    try:
+        return int(width) * int(height or width)
+    except ValueError:
+        return None
+
+
+def image_pixels(file_path):
+    try:
+        width, height = get_image_size.get_image_size_cached(file_path)
+        return width * height
+    except (OSError, get_image_size.UnknownImageFormat):
+        return None
+
+
+def option_value(command, option):
+    if option in command[:-1]:
+        return command[command.index(option) + 1]
+    return None
+
+
+def command_images(command):
+    ''' Example and guide image paths - after subcommand every option value is an image too (--style, --guide, --guides) '''
+    start = next((i for i, arg in enumerate(command) if arg in SUBCOMMANDS), None)
+    if start is None:
+        return []
+    return [arg for arg in command[start + 1:] if not arg.startswith('--')]
+
+
+def features_from_command(command):
+    ''' (example_pixels, out_pixels, k_neighs) of texture-synthesis command line. --in-size scales every example '''
+    images = command_images(command)
+    in_pixels = parse_size(option_value(command, '--in-size'))
+    if in_pixels:
+        example_pixels = in_pixels * max(1, len(images))
+    else:
+        example_pixels = sum(image_pixels(path) or DEFAULT_OUT_PIXELS for path in images) or DEFAULT_OUT_PIXELS
+    out_pixels = parse_size(option_value(command, '--out-size')) or DEFAULT_OUT_PIXELS
+    try:
+        k_neighs = int(option_value(command, '--k-neighs') or DEFAULT_K_NEIGHS)
+    except ValueError:
+        k_neighs = DEFAULT_K_NEIGHS
+    return example_pixels, out_pixels, k_neighs
+
+
+def features_from_record(record):
+    ''' Features of telemetry record. Older records have no 'memory' entry - those are rebuilt from sizes, with one example '''
+    memory = record.get('memory')
+    if memory:
+        return memory['example_pixels'], memory['out_pixels'], memory['k_neighs']
+    input_dims = record.get('input_dims')
+    example_pixels = parse_size(record.get('in_size')) or (input_dims[0] * input_dims[1] if input_dims else None)
+    out_pixels = parse_size(record.get('out_size'))
+    k_neighs = record.get('params', {}).get('k_neighs')
+    if not example_pixels or not out_pixels or k_neighs is None:
+        return None
+    return example_pixels, out_pixels, int(k_neighs)
+
+
+def prior_estimate_mb(features):
+    example_pixels, out_pixels, k_neighs = features
+    return BASE_MB + (example_pixels * BYTES_PER_EXAMPLE_PIXEL + out_pixels * (BYTES_PER_OUT_PIXEL + k_neighs * BYTES_PER_OUT_PIXEL_NEIGHBOUR)) / (1024 * 1024)
+
+
+def total_ram_mb():
+    ''' Physical memory in MB, None where it can not be told without extra modules (windows) '''
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def budget_mb(ram_budget_mb=0):
+    ''' RAM budget to use: given one, or DEFAULT_BUDGET_FRACTION of physical memory if it is 0. 0 (no limit) if memory size is unknown '''
+    if ram_budget_mb > 0:
+        return ram_budget_mb
+    total = total_ram_mb()
+    return total * DEFAULT_BUDGET_FRACTION if total else 0
+
+
+class MemoryModel:
+    def __init__(self, history=200):
+        self.measured = {}  # features -> highest peak RSS MB seen
+        self.ratios = deque(maxlen=history)  # measured / prior of recent runs
+        self.scale = 1.0
+
+    def observe(self, features, peak_rss_mb):
+        if not features or not peak_rss_mb:
+            return
+        self.measured[features] = max(peak_rss_mb, self.measured.get(features, 0.0))
+        self.ratios.append(peak_rss_mb / prior_estimate_mb(features))
+        ratios = sorted(self.ratios)
+        self.scale = min(MAX_RATIO, max(MIN_RATIO, ratios[int(RATIO_PERCENTILE * (len(ratios) - 1))]))
+
+    def observe_records(self, records):
+        ''' Learn from telemetry records (tsynth_telemetry.read_records). Only finished runs - killed ones did not reach their peak '''
+        for record in records:
+            if record.get('status') == 'DONE' and record.get('peak_rss_mb'):
+                self.observe(features_from_record(record), record['peak_rss_mb'])
+
+    def estimate_mb(self, features):
+        if features in self.measured:
+            return self.measured[features] * 1.05  # same run again - only noise between runs
+        return prior_estimate_mb(features) * self.scale
+
@@ -0,0 +1,216 @@
+'''
+Copyright (C) 2019 JOSECONSCO
+Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simple Asset Manager)
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+# PNG decoder and encoder for worker threads. Pixels are float32 RGBA arrays in blender pixel order (bottom row first),
+# same as image.pixels.foreach_get() / foreach_set() use. No bpy in here.
+# Decoder covers what texture-synthesis writes: non interlaced 8/16 bit gray, RGB, palette, with None/Sub/Up row filters.
+# Anything else raises ValueError in decode_png(), and caller falls back to loading image with blender.
+
+import os
+import struct
+import threading
+import zlib
+import numpy as np
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # color type -> samples per pixel
+FILTER_NONE, FILTER_SUB, FILTER_UP = 0, 1, 2
+
+
+class BufferPool:
+    ''' Reuses float32 pixel buffers between decodes of same size images, eg. repeated runs into same output '''
+    def __init__(self, max_buffers=4):
+        self.max_buffers = max_buffers
+        self.buffers = []
+        self.lock = threading.Lock()
+
+    def acquire(self, shape):
+        with self.lock:
+            for i, buffer in enumerate(self.buffers):
+                if buffer.shape == shape:
+                    return self.buffers.pop(i)
+        return np.empty(shape, dtype=np.float32)
+
+    def release(self, buffer):
+        with self.lock:
+            if len(self.buffers) >= self.max_buffers:
+                self.buffers.pop(0)
+            self.buffers.append(buffer)
+
+
+def read_chunks(data):
+    ''' Returns (ihdr, palette, trns, idat) payloads '''
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError('Not a PNG file')
+    pos = 8
+    ihdr = palette = trns = None
+    idat = []
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack('>L4s', data[pos:pos + 8])
+        payload = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if chunk_type == b'IHDR':
+            ihdr = payload
+        elif chunk_type == b'PLTE':
+            palette = payload
+        elif chunk_type == b'tRNS':
+            trns = payload
+        elif chunk_type == b'IDAT':
+            idat.append(payload)
+        elif chunk_type == b'IEND':
+            break
+    if ihdr is None or not idat:
+        raise ValueError('PNG without IHDR or IDAT chunk')
+    return ihdr, palette, trns, b''.join(idat)
+
+
+def unfilter(rows, filters, bpp):
+    ''' In place reconstruction of filtered scanlines (height, stride) uint8. uint8 cumsum wraps like PNG's mod 256 sums '''
+    height, stride = rows.shape
+    unsupported = set(np.unique(filters).tolist()) - {FILTER_NONE, FILTER_SUB, FILTER_UP}
+    if unsupported:
+        raise ValueError(f'PNG row filters {sorted(unsupported)} are not supported')
+    sub = filters == FILTER_SUB
+    if sub.any():  # depends only on own row - all at once
+        pixels = rows[sub].reshape(-1, stride // bpp, bpp)
+        rows[sub] = np.cumsum(pixels, axis=1, dtype=np.uint8).reshape(-1, stride)
+    up_rows = np.flatnonzero(filters == FILTER_UP)
+    if up_rows.size:  # runs of Up rows are cumulative sum down from row above the run
+        run_starts = up_rows[np.r_[True, np.diff(up_rows) > 1]]
+        run_ends = up_rows[np.r_[np.diff(up_rows) > 1, True]]
+        for start, end in zip(run_starts, run_ends):
+            first = max(start - 1, 0)
+            rows[first:end + 1] = np.cumsum(rows[first:end + 1], axis=0, dtype=np.uint8)
+    return rows
+
+
+def decode_png(file_path, pool=None):
+    ''' (height, width, 4) float32 RGBA in 0-1 range, bottom row first. Buffer comes from pool if given '''
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    ihdr, palette, trns, compressed = read_chunks(data)
+    width, height, bit_depth, color_type, _, _, interlace = struct.unpack('>LLBBBBB', ihdr)
+    if interlace:
+        raise ValueError('Interlaced PNG is not supported')
+    if color_type not in CHANNELS or bit_depth not in (8, 16) or (color_type == 3 and bit_depth != 8):
+        raise ValueError(f'PNG color type {color_type} with bit depth {bit_depth} is not supported')
+    channels = CHANNELS[color_type]
+    bpp = channels * bit_depth // 8
+    stride = width * bpp
+
+    raw = np.frombuffer(zlib.decompress(compressed), dtype=np.uint8)
+    if raw.size < height * (stride + 1):
+        raise ValueError('PNG image data is truncated')
+    scanlines = raw[:height * (stride + 1)].reshape(height, stride + 1)
+    rows = unfilter(scanlines[:, 1:].copy(), scanlines[:, 0], bpp)
+
+    if bit_depth == 16:
+        samples = rows.view('>u2').reshape(height, width, channels)[::-1]
+        scale = np.float32(1 / 65535)
+    else:
+        samples = rows.reshape(height, width, channels)[::-1]
+        scale = np.float32(1 / 255)
+
+    out = pool.acquire((height, width, 4)) if pool is not None else np.empty((height, width, 4), dtype=np.float32)
+    if color_type == 3:
+        if palette is None:
+            raise ValueError('Palette PNG without PLTE chunk')
+        lut = np.ones((256, 4), dtype=np.float32)
+        colors = np.frombuffer(palette, dtype=np.uint8).reshape(-1, 3)
+        lut[:len(colors), :3] = colors * scale
+        if trns:
+            alpha = np.frombuffer(trns, dtype=np.uint8)[:256]
+            lut[:len(alpha), 3] = alpha * scale
+        np.take(lut, samples[..., 0], axis=0, out=out)
+        return out
+    if channels >= 3:
+        np.multiply(samples[..., :3], scale, out=out[..., :3])
+    else:
+        np.multiply(samples[..., :1], scale, out=out[..., :1])
+        out[..., 1] = out[..., 0]
+        out[..., 2] = out[..., 0]
+    if channels in (2, 4):
+        np.multiply(samples[..., -1], scale, out=out[..., 3])
+    else:
+        out[..., 3] = 1.0
+    return out
+
+
+def encode_png(pixels, file_path, level=3):
+    ''' Write (height, width, 4) float RGBA array, bottom row first, as 8 bit PNG. Rows use Sub filter, which decode_png() reads fast.
+    File is written under temp name and renamed, so readers never see half written file '''
+    height, width = pixels.shape[:2]
+    with PNGWriter(file_path, width, height, level) as writer:
+        writer.write_rows(pixels[::-1])
+    return file_path
+
+
+class PNGWriter:
+    ''' Streams 8 bit RGBA PNG to disk, rows given top first, so whole image never has to be in memory. Use as context manager '''
+    def __init__(self, file_path, width, height, level=3):
+        self.file_path = file_path
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.tmp_path = f'{file_path}.{threading.get_ident()}.tmp'
+        self.compressor = zlib.compressobj(level)
+        self.file = open(self.tmp_path, 'wb')
+        self.file.write(PNG_SIGNATURE + self.chunk(b'IHDR', struct.pack('>LLBBBBB', width, height, 8, 6, 0, 0, 0)))
+
+    @staticmethod
+    def chunk(chunk_type, payload):
+        return struct.pack('>L', len(payload)) + chunk_type + payload + struct.pack('>L', zlib.crc32(chunk_type + payload) & 0xffffffff)
+
+    def write_rows(self, pixels):
+        ''' (rows, width, 4) float array, top row first '''
+        rows = (np.clip(pixels, 0.0, 1.0) * 255 + 0.5).astype(np.uint8).reshape(len(pixels), self.width * 4)
+        filtered = np.empty((len(rows), self.width * 4 + 1), dtype=np.uint8)
+        filtered[:, 0] = FILTER_SUB
+        filtered[:, 1:5] = rows[:, :4]
+        np.subtract(rows[:, 4:], rows[:, :-4], out=filtered[:, 5:])
+        data = self.compressor.compress(filtered.tobytes())
+        if data:
+            self.file.write(self.chunk(b'IDAT', data))
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self.file is None:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f'PNG has {self.height} rows, but {self.rows_written} were written')
+            self.file.write(self.chunk(b'IDAT', self.compressor.flush()) + self.chunk(b'IEND', b''))
+            self.file.close()
+            os.replace(self.tmp_path, self.file_path)
+        except BaseException:
+            self.file.close()
+            os.remove(self.tmp_path)
+            raise
+        finally:
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.file is not None:
+            self.file.close()
+            self.file = None
+            os.remove(self.tmp_path)
@@ -23,9 +23,74 @@ import os
 from . import get_image_size
 from tempfile import gettempdir
 from . import tsynth_ui
+from . import tsynth_thumbs
+from .utils import redraw_image_editors, get_cache_dir
 
 preview_collections = {}
-FORCE_REFRESH_ICO = False
+IMAGE_EXTENSIONS = get_image_size.IMAGE_EXTENSIONS  # formats that can be probed for size without decoding
+
+
+def scan_directory(directory):
+    """Returns {file_name: (mtime_ns, size)} for images in directory"""
+    snapshot = {}
+    if not directory or not os.path.isdir(directory):
+        return snapshot
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                stat = entry.stat()
+                snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+def update_previews(pcoll, directory):
+    """Rescan directory and patch preview collection with added, removed and changed images only. Returns (added, removed, changed) names"""
+    new_snapshot = scan_directory(directory)
+    old_snapshot = pcoll.dir_snapshot
+    added = new_snapshot.keys() - old_snapshot.keys()
+    removed = old_snapshot.keys() - new_snapshot.keys()
+    changed = {name for name in new_snapshot.keys() & old_snapshot.keys() if new_snapshot[name] != old_snapshot[name]}
+
+    for name in removed | changed:
+        if name in pcoll:
+            del pcoll[name]  # releases preview
+        if name in removed:
+            del pcoll.enum_items[name]
+    for name in added | changed:
+        # generates a thumbnail preview for a file, or shows placeholder till background thumbnail is ready
+        thumb_path = tsynth_thumbs.get_cached_thumbnail(os.path.join(directory, name))
+        icon = pcoll.load(name, thumb_path, 'IMAGE').icon_id if thumb_path else 'FILE_IMAGE'
+        enum_id = pcoll.enum_ids.setdefault(name, len(pcoll.enum_ids))  # keep enum number stable, so selection does not jump to other image
+        short_name = name[:10]+'..' + name[-5:] if len(name) > 20 else name
+        pcoll.enum_items[name] = (name, short_name, "", icon, enum_id)
+
+    pcoll.dir_snapshot = new_snapshot
+    pcoll.my_previews = [pcoll.enum_items[name] for name in sorted(pcoll.enum_items)]
+    if tsynth_thumbs.PENDING and not bpy.app.timers.is_registered(load_finished_thumbnails):
+        bpy.app.timers.register(load_finished_thumbnails, first_interval=0.1)
+    return added, removed, changed
+
+
+def load_finished_thumbnails():
+    """Timer - swaps placeholders for thumbnails generated in background, and redraws panel"""
+    pcoll = preview_collections.get("main")
+    if pcoll is None:
+        return None
+    finished = tsynth_thumbs.collect_thumbnails()
+    for file_path, thumb_path in finished:
+        name = os.path.basename(file_path)
+        if name not in pcoll.enum_items or os.path.join(pcoll.input_images_dir, name) != file_path:
+            continue  # directory was changed in meantime
+        if name in pcoll:
+            del pcoll[name]
+        thumb = pcoll.load(name, thumb_path, 'IMAGE')
+        item = pcoll.enum_items[name]
+        pcoll.enum_items[name] = item[:3] + (thumb.icon_id, item[4])
+    if finished:
+        pcoll.my_previews = [pcoll.enum_items[name] for name in sorted(pcoll.enum_items)]
+        redraw_image_editors()
+    return 0.2 if tsynth_thumbs.PENDING else None
+
 
 class SelectedImages(bpy.types.PropertyGroup):
     image_name: bpy.props.StringProperty()
@@ -34,7 +99,7 @@ class TextSynth_Settings(bpy.types.PropertyGroup):
     def update_input_img_size(self, context):
         input_img_path = os.path.join(self.input_images_dir, self.my_previews) if self.gen_type != 'transfer-style' else bpy.path.abspath(self.to_guide.filepath_raw)
         try:
-            width, height = get_image_size.get_image_size(input_img_path)
+            width, height = get_image_size.get_image_size_cached(input_img_path)
         except get_image_size.UnknownImageFormat:
             width, height = 400, 400
         print(f'Updating output size {width}x{height}')
@@ -67,7 +132,6 @@ class TextSynth_Settings(bpy.types.PropertyGroup):
 
     def enum_previews_from_directory_items(self, context):
         """EnumProperty callback"""
-        global FORCE_REFRESH_ICO
         enum_items = []
         if context is None:
             return enum_items
@@ -79,38 +143,25 @@ class TextSynth_Settings(bpy.types.PropertyGroup):
         pcoll = preview_collections["main"]
 
         if directory == pcoll.input_images_dir:
-            if not FORCE_REFRESH_ICO:
-                return pcoll.my_previews
-            else:
-                FORCE_REFRESH_ICO = False
-
+            return pcoll.my_previews
 
         # bpy.ops.object.clear_img_synth()
         pcoll.clear()
+        pcoll.dir_snapshot = {}
+        pcoll.enum_items = {}
         print("Scanning directory: %s" % directory)
-
-        if directory and os.path.exists(directory):
-            # Scan the directory for png files
-            image_paths = []
-            for fn in os.listdir(directory):
-                if fn.lower().endswith((".png", ".bmp", ".jpg")):
-                    image_paths.append(fn)
-
-            for i, name in enumerate(image_paths):
-                # generates a thumbnail preview for a file.
-                filepath = os.path.join(directory, name)
-                icon = pcoll.get(name)
-                if not icon:
-                    thumb = pcoll.load(name, filepath, 'IMAGE')
-                else:
-                    thumb = pcoll[name]
-                short_name = name[:10]+'..' + name[-5:] if len(name) > 20 else name
-                enum_items.append((name, short_name, "", thumb.icon_id, i)) 
-
-        pcoll.my_previews = enum_items
+        update_previews(pcoll, directory)
         pcoll.input_images_dir = directory
         return pcoll.my_previews
 
+    def live_rerun(self, context):
+        if not self.live_update:
+            return
+        # debounce - dragging slider fires update many times, run only once it settles
+        if bpy.app.timers.is_registered(run_live_update):
+            bpy.app.timers.unregister(run_live_update)
+        bpy.app.timers.register(run_live_update, first_interval=LIVE_DEBOUNCE)
+
     def suffix_fix(self, context):
         file_name, ext = os.path.splitext(self.output_file_name)
         self['output_file_name'] = file_name+'.png'
@@ -136,24 +187,24 @@ class TextSynth_Settings(bpy.types.PropertyGroup):
                                             ('transfer-style', 'Style Transfer', 'Texture synthesis API supports auto-generation of example guide maps, which produces a style transfer-like effect.'),
                                             ('inpaint', 'Inpaint', 'We can also fill-in missing information with inpaint. By changing the seed, we will get different version of the "fillment".'),
                                             ], default='generate')
-    tiling: bpy.props.BoolProperty(name='Tiling', description='Enables tiling of the output image', default=True)
+    tiling: bpy.props.BoolProperty(name='Tiling', description='Enables tiling of the output image', default=True, update=live_rerun)
     seed: bpy.props.IntProperty(name='Seed', description='A seed value for the random generator to give pseudo-deterministic result.'
-                                ' Smaller details will be different from generation to generation due to the non-deterministic nature of multi-threading', default=1, min=1)
-    rand_init: bpy.props.IntProperty(name='Random Initiation', description='The number of randomly initialized pixels before the main resolve loop starts', default=1, min=1)
+                                ' Smaller details will be different from generation to generation due to the non-deterministic nature of multi-threading', default=1, min=1, update=live_rerun)
+    rand_init: bpy.props.IntProperty(name='Random Initiation', description='The number of randomly initialized pixels before the main resolve loop starts', default=1, min=1, update=live_rerun)
     k_neighs: bpy.props.IntProperty(
-        name='Neighbours', description='The number of neighboring pixels each pixel is aware of during the generation, larger numbers means more global structures are captured. Default=50', default=50, min=1, soft_max=100)
+        name='Neighbours', description='The number of neighboring pixels each pixel is aware of during the generation, larger numbers means more global structures are captured. Default=50', default=50, min=1, soft_max=100, update=live_rerun)
     cauchy: bpy.props.FloatProperty(name='Cauchy', description='The distribution dispersion used for picking '
                                     'best candidate (controls the distribution "tail flatness").Values close to 0.0 will produce "harsh" borders between generated "chunks".'
-                                    ' Values closer to 1.0 will produce a smoother gradient on those borders', min=0, max=1, default=1.0)
-    backtrack_stages: bpy.props.IntProperty(name='Backtrack Stages', description='The number of backtracking stages. Backtracking prevents "garbage" generation', default=5, min=0, max=10)
-    backtrack_pct: bpy.props.IntProperty(name='Backtrack Percentage', description='The percentage of pixels to be backtracked during each p_stage.', default=50, min=0, max=100)
+                                    ' Values closer to 1.0 will produce a smoother gradient on those borders', min=0, max=1, default=1.0, update=live_rerun)
+    backtrack_stages: bpy.props.IntProperty(name='Backtrack Stages', description='The number of backtracking stages. Backtracking prevents "garbage" generation', default=5, min=0, max=10, update=live_rerun)
+    backtrack_pct: bpy.props.IntProperty(name='Backtrack Percentage', description='The percentage of pixels to be backtracked during each p_stage.', default=50, min=0, max=100, update=live_rerun)
     output_file_name: bpy.props.StringProperty(name='Name', default='Generated.png', update=suffix_fix)
 
     to_guide: bpy.props.PointerProperty(name='To', type=bpy.types.Image, update=update_input_img_size)
     from_guide: bpy.props.PointerProperty(name='From', type=bpy.types.Image)
 
     alpha: bpy.props.FloatProperty(
-        name='Guide Importance', description='Alpha parameter controls the \'importance\' of the user guide maps. If you want to preserve more details from the example map, make sure the number smaller than 1.0 (Range: 0.0 - 1.0).', default=0.8, min=0.0, soft_max=1.0)
+        name='Guide Importance', description='Alpha parameter controls the \'importance\' of the user guide maps. If you want to preserve more details from the example map, make sure the number smaller than 1.0 (Range: 0.0 - 1.0).', default=0.8, min=0.0, soft_max=1.0, update=live_rerun)
 
     in_size_from_preset: bpy.props.BoolProperty(name='Input size from preset', description='Input size from preset', default=False)
     in_size_percent: bpy.props.IntProperty(name='%', description='Input size multiplier', default=100, min=0, soft_max=100, subtype='PERCENTAGE')
@@ -183,16 +234,30 @@ class TextSynth_Settings(bpy.types.PropertyGroup):
                                                      ('128', '128', ''),
                                                      ('256', '256', ''),
                                                      ('512', '512', ''),
-                                                     ('1024', '1024', '')
+                                                     ('1024', '1024', ''),
+                                                     ('2048', '2048', 'Use Tiled for less memory'),
+                                                     ('4096', '4096', 'Use Tiled for less memory'),
+                                                     ('8192', '8192', 'Use Tiled for less memory')
                                                      ], default='512')
     out_size_preset_y: bpy.props.EnumProperty(name='Output Size', description='From Preset',  # can be  x * x , or x * y
                                               items=[('64',   '64', ''),
                                                      ('128', '128', ''),
                                                      ('256', '256', ''),
                                                      ('512', '512', ''),
-                                                     ('1024', '1024', '')
+                                                     ('1024', '1024', ''),
+                                                     ('2048', '2048', 'Use Tiled for less memory'),
+                                                     ('4096', '4096', 'Use Tiled for less memory'),
+                                                     ('8192', '8192', 'Use Tiled for less memory')
                                                      ], default='512')
 
+    tiled: bpy.props.BoolProperty(name='Tiled', description='Generate big outputs as overlapping tiles, run in parallel. Each tile is inpainted to continue already generated neighbours, then tiles are blended together.\n'
+                                  'Memory use depends on tile size, not on output size. Works for Generate and Multi Generate', default=False)
+    tile_size: bpy.props.IntProperty(name='Tile', description='Tile size in pixels', default=512, min=64, soft_max=1024)
+    tile_overlap: bpy.props.IntProperty(name='Overlap', description='Overlap of neighbouring tiles in pixels. Bigger overlap gives tiles more context to continue from', default=64, min=8, soft_max=256)
+    live_update: bpy.props.BoolProperty(name='Live', description='Re-run synthesis at preview size whenever seed, neighbours, cauchy etc. change. Run for old settings that is still going gets killed', default=False, update=live_rerun)
+    progressive: bpy.props.BoolProperty(name='Progressive', description='First generate quick low resolution preview and show it. Full resolution run starts right after it and replaces preview when finished', default=False)
+    preview_percent: bpy.props.IntProperty(name='Preview Size', description='Preview input and output size, in percent of full size', default=25, min=5, max=100, subtype='PERCENTAGE')
+
     out_method: bpy.props.EnumProperty(name='Method', description='How / where to save generated image',
                                        items=[('TARGET_DIR', 'To Directory', 'Write to target dir'),
                                               ('OVERRIDE', 'Override input image', 'Override input image'),
@@ -201,6 +266,48 @@ class TextSynth_Settings(bpy.types.PropertyGroup):
 
 
 
+LIVE_DEBOUNCE = 0.4  # sec
+
+
+def run_live_update():
+    """Timer - runs synthesis once settings did not change for LIVE_DEBOUNCE"""
+    try:
+        bpy.ops.object.run_tsynthesis(live=True)
+    except RuntimeError as e:  # eg. no input image picked yet
+        print(f'Live update failed: {e}')
+    return None
+
+
+def settings_to_dict(tsynth_params):
+    """All TextSynth_Settings values as json friendly dict. Images are stored by name"""
+    settings = {}
+    for prop in tsynth_params.bl_rna.properties:
+        if prop.identifier == 'rna_type' or prop.type == 'COLLECTION':
+            continue
+        value = getattr(tsynth_params, prop.identifier)
+        if prop.type == 'POINTER':
+            value = value.name if value else None
+        elif getattr(prop, 'is_array', False):
+            value = list(value)
+        settings[prop.identifier] = value
+    return settings
+
+
+def get_metadata_cache_file():
+    return os.path.join(get_cache_dir(''), 'image_metadata.json')
+
+
+def load_metadata_cache():
+    get_image_size.metadata_cache.load(get_metadata_cache_file())
+
+
+def save_metadata_cache():
+    try:
+        get_image_size.metadata_cache.save(get_metadata_cache_file())
+    except OSError as e:
+        print(f'Could not save image metadata cache: {e}')
+
+
 def register_thumbs():
     # Note that preview collections returned by bpy.utils.previews
     # are regular Python objects - you can use them to store custom data.
@@ -214,11 +321,19 @@ def register_thumbs():
     pcoll = bpy.utils.previews.new()
     pcoll.input_images_dir = ""
     pcoll.my_previews = ()
+    pcoll.dir_snapshot = {}  # last scan of input_images_dir: {name: (mtime_ns, size)}
+    pcoll.enum_items = {}
+    pcoll.enum_ids = {}
 
     preview_collections["main"] = pcoll
 
 
 def unregister_thumbs():
+    if bpy.app.timers.is_registered(run_live_update):
+        bpy.app.timers.unregister(run_live_update)
+    if bpy.app.timers.is_registered(load_finished_thumbnails):
+        bpy.app.timers.unregister(load_finished_thumbnails)
+    tsynth_thumbs.shutdown()
     for pcoll in preview_collections.values():
         bpy.utils.previews.remove(pcoll)
     preview_collections.clear()
@@ -0,0 +1,223 @@
+'''
+Copyright (C) 2019 JOSECONSCO
+Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simple Asset Manager)
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+# Job queue in directory on shared filesystem, drained by workers on one or more hosts. No bpy in here:
+#   python tsynth_queue.py enqueue /mnt/farm/queue spec.json            # or 'Export Job Queue' in add-on
+#   python tsynth_queue.py work /mnt/farm/queue --exe texture-synthesis -j 2
+#   python tsynth_queue.py status /mnt/farm/queue
+#
+# Each job is one json file (tsynth_command job spec) moving between sub directories:
+#   pending/<id>.json -> claimed/<id>@<worker>.json -> done/<id>.json or failed/<id>.json
+# Claim is os.rename() out of pending/ - atomic, so only one worker gets the job. Worker keeps touching its claim file while job runs.
+# Claim not touched for lease seconds is moved back to pending/ by any worker - that is how jobs of crashed workers are recovered.
+# Keep lease well above clock difference between hosts. Paths in jobs have to be valid on every host (same mount points).
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+
+try:
+    from . import tsynth_jobs
+    from . import tsynth_command
+    from . import tsynth_memory
+except ImportError:  # run as script, outside of blender
+    import tsynth_jobs
+    import tsynth_command
+    import tsynth_memory
+
+PENDING, CLAIMED, DONE, FAILED = 'pending', 'claimed', 'done', 'failed'
+MANIFEST = 'manifest.json'
+
+
+def write_json(file_path, data):
+    tmp_path = f'{file_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, file_path)
+
+
+def read_json(file_path):
+    with open(file_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def job_id_of(file_name):
+    return file_name[:-len('.json')].split('@')[0]
+
+
+def enqueue(queue_dir, manifest):
+    ''' Write manifest ({"defaults": {...}, "jobs": [...]}) to queue. Defaults are merged into each job file. Returns number of queued jobs '''
+    for sub_dir in (PENDING, CLAIMED, DONE, FAILED):
+        os.makedirs(os.path.join(queue_dir, sub_dir), exist_ok=True)
+    write_json(os.path.join(queue_dir, MANIFEST), manifest)
+    defaults = manifest.get('defaults', {})
+    stamp = time.strftime('%Y%m%d%H%M%S')
+    for i, job in enumerate(manifest.get('jobs', [])):
+        name = os.path.splitext(os.path.basename(job.get('out', '')))[0]
+        write_json(os.path.join(queue_dir, PENDING, f'{stamp}_{i:05d}_{name}.json'), dict(defaults, **job))
+    return len(manifest.get('jobs', []))
+
+
+def recover_expired(queue_dir, lease):
+    ''' Move claims whose lease expired back to pending. Returns recovered job ids '''
+    recovered = []
+    claimed_dir = os.path.join(queue_dir, CLAIMED)
+    for entry in os.scandir(claimed_dir):
+        try:
+            if time.time() - entry.stat().st_mtime <= lease:
+                continue
+            os.rename(entry.path, os.path.join(queue_dir, PENDING, job_id_of(entry.name) + '.json'))
+        except FileNotFoundError:  # finished or recovered by someone else
+            continue
+        recovered.append(job_id_of(entry.name))
+    return recovered
+
+
+def count(queue_dir, sub_dir):
+    return sum(1 for name in os.listdir(os.path.join(queue_dir, sub_dir)) if name.endswith('.json'))
+
+
+class Claim:
+    def __init__(self, queue_dir, job_id, worker_id):
+        self.queue_dir = queue_dir
+        self.job_id = job_id
+        self.path = os.path.join(queue_dir, CLAIMED, f'{job_id}@{worker_id}.json')
+
+    def renew(self):
+        ''' Extend lease. False if claim was lost - lease expired and job was moved back to pending '''
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def finish(self, status, error=''):
+        sub_dir = DONE if status == tsynth_jobs.DONE else FAILED
+        try:
+            job = read_json(self.path)
+        except FileNotFoundError:
+            return
+        job['result'] = {'status': status, 'error': error, 'worker': os.path.basename(self.path)[:-len('.json')].split('@', 1)[1]}
+        write_json(os.path.join(self.queue_dir, sub_dir, self.job_id + '.json'), job)
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def claim_next(queue_dir, worker_id):
+    ''' Atomically take oldest pending job. Returns (Claim, job dict) or (None, None) if queue is empty '''
+    for name in sorted(os.listdir(os.path.join(queue_dir, PENDING))):
+        if not name.endswith('.json'):
+            continue
+        claim = Claim(queue_dir, job_id_of(name), worker_id)
+        pending_path = os.path.join(queue_dir, PENDING, name)
+        try:
+            # rename keeps mtime - touch first, so claim never shows up in claimed/ already expired (recover_expired of other workers)
+            os.utime(pending_path)
+            os.rename(pending_path, claim.path)
+        except FileNotFoundError:  # other worker was faster
+            continue
+        try:
+            os.utime(claim.path)
+            return claim, read_json(claim.path)
+        except FileNotFoundError:  # recovered by other worker anyway (eg. clock skew between hosts) - leave it to pending again
+            continue
+        except (OSError, ValueError) as e:
+            claim.finish(tsynth_jobs.FAILED, f'Could not read job: {e}')
+    return None, None
+
+
+def work(queue_dir, exe, max_jobs=1, lease=120, worker_id=None, timeout=0, poll_interval=1.0, partition_cores=False, ram_budget_mb=0):
+    ''' Drain queue. Returns once pending and claimed are empty (claims of other workers are waited for - they may expire and come back) '''
+    worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+    scheduler = tsynth_jobs.JobScheduler(max_jobs, partition_cores, tsynth_memory.budget_mb(ram_budget_mb))
+    claims = {}  # SynthJob -> Claim
+    finished = []
+    renew_interval = min(lease / 3, 30)
+    last_renew = time.time()
+
+    def on_done(job):
+        claims.pop(job).finish(job.status, job.error)
+        finished.append(job)
+
+    while True:
+        for job_id in recover_expired(queue_dir, lease):
+            print(f'Lease of {job_id} expired - moved back to pending')
+        while len(scheduler.running) + len(scheduler.queue) < max(1, max_jobs):
+            claim, job = claim_next(queue_dir, worker_id)
+            if claim is None:
+                break
+            try:
+                (command, out_path), = tsynth_command.jobs_from_spec({'jobs': [job]}, exe)
+                os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+            except (OSError, ValueError) as e:
+                claim.finish(tsynth_jobs.FAILED, str(e))
+                continue
+            claims[scheduler.submit(command, out_path, timeout=timeout, on_done=on_done)] = claim
+        if time.time() - last_renew > renew_interval:
+            last_renew = time.time()
+            for job, claim in list(claims.items()):
+                if not claim.renew():
+                    print(f'Lost claim of {claim.job_id} - lease expired, stopping it')
+                    claims.pop(job)
+                    job.on_done = None
+                    scheduler.cancel(job)
+        busy = scheduler.tick()
+        if not busy and not claims and count(queue_dir, PENDING) == 0 and count(queue_dir, CLAIMED) == 0:
+            break
+        time.sleep(poll_interval)
+    done = sum(1 for job in finished if job.status == tsynth_jobs.DONE)
+    print(f'Worker {worker_id}: {done} jobs done, {len(finished) - done} failed')
+    return finished
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Shared texture-synthesis job queue')
+    sub = parser.add_subparsers(dest='action', required=True)
+    p = sub.add_parser('enqueue', help='add jobs from json spec (see tsynth_command.py)')
+    p.add_argument('queue_dir')
+    p.add_argument('spec')
+    p = sub.add_parser('work', help='run jobs until queue is empty')
+    p.add_argument('queue_dir')
+    p.add_argument('--exe', required=True, help='texture-synthesis executable on this host')
+    p.add_argument('-j', '--jobs', type=int, default=1, help='processes running at once on this host')
+    p.add_argument('--lease', type=float, default=120, help='seconds without renewal after which claim counts as abandoned')
+    p.add_argument('--timeout', type=int, default=0, help='kill job after this many seconds, 0 - no limit')
+    p.add_argument('--worker-id')
+    p.add_argument('--partition-cores', action='store_true', help='give each running job its own cores (--threads and CPU affinity)')
+    p.add_argument('--ram-budget', type=int, default=0, metavar='MB', help='start jobs only while their estimated peak memory fits (default: 75%% of physical memory)')
+    p = sub.add_parser('status')
+    p.add_argument('queue_dir')
+    args = parser.parse_args(argv)
+
+    if args.action == 'enqueue':
+        print(f'Queued {enqueue(args.queue_dir, read_json(args.spec))} jobs')
+    elif args.action == 'work':
+        finished = work(args.queue_dir, args.exe, args.jobs, args.lease, args.worker_id, args.timeout, partition_cores=args.partition_cores, ram_budget_mb=args.ram_budget)
+        return 0 if all(job.status == tsynth_jobs.DONE for job in finished) else 1
+    else:
+        print(', '.join(f'{sub_dir}: {count(args.queue_dir, sub_dir)}' for sub_dir in (PENDING, CLAIMED, DONE, FAILED)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+'''
+Copyright (C) 2019 JOSECONSCO
+Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simple Asset Manager)
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+# Parameter sweep helpers and contact sheet assembly. No bpy in here - images are (height, width, 4) float32 arrays, top row first.
+
+import math
+import itertools
+import numpy as np
+
+# 3x5 bitmap glyphs - enough for sweep labels like 's12 c1.0 k50 b5'
+GLYPHS = {
+    '0': ('111', '101', '101', '101', '111'),
+    '1': ('010', '110', '010', '010', '111'),
+    '2': ('111', '001', '111', '100', '111'),
+    '3': ('111', '001', '111', '001', '111'),
+    '4': ('101', '101', '111', '001', '001'),
+    '5': ('111', '100', '111', '001', '111'),
+    '6': ('111', '100', '111', '101', '111'),
+    '7': ('111', '001', '001', '001', '001'),
+    '8': ('111', '101', '111', '101', '111'),
+    '9': ('111', '101', '111', '001', '111'),
+    '.': ('000', '000', '000', '000', '010'),
+    '-': ('000', '000', '111', '000', '000'),
+    's': ('011', '100', '010', '001', '110'),
+    'c': ('000', '111', '100', '100', '111'),
+    'k': ('100', '101', '110', '101', '101'),
+    'b': ('100', '100', '111', '101', '111'),
+}
+GLYPH_W, GLYPH_H = 3, 5
+
+
+def parse_values(text, cast=int):
+    ''' '1,5,9' -> [1, 5, 9], '0:3' -> [0, 1, 2, 3], '0.5:1:0.25' -> [0.5, 0.75, 1.0]. Ranges are inclusive, step defaults to 1.
+    Raises ValueError on bad input '''
+    values = []
+    for item in text.replace(' ', '').split(','):
+        if not item:
+            continue
+        if ':' in item:
+            parts = [cast(v) for v in item.split(':')]
+            if len(parts) not in (2, 3):
+                raise ValueError(f'Range should be start:stop or start:stop:step, got {item!r}')
+            start, stop = parts[:2]
+            step = parts[2] if len(parts) == 3 else cast(1)
+            if step <= 0:
+                raise ValueError(f'Range step has to be positive, got {item!r}')
+            count = int(math.floor((stop - start) / step + 1e-9)) + 1
+            values.extend(cast(round(start + i * step, 6)) for i in range(max(count, 0)))
+        else:
+            values.append(cast(item))
+    return values
+
+
+def sweep_combinations(axes):
+    ''' axes: [(name, [values])]. Returns list of {name: value} dicts - cartesian product, first axis changes slowest '''
+    names = [name for name, _ in axes]
+    return [dict(zip(names, combo)) for combo in itertools.product(*(values for _, values in axes))]
+
+
+def draw_text(image, text, x, y, scale=2, color=(1.0, 1.0, 1.0, 1.0)):
+    ''' Stamp text into image with top left corner at (x, y). Unknown characters are left blank '''
+    advance = (GLYPH_W + 1) * scale
+    for i, char in enumerate(text):
+        glyph = GLYPHS.get(char)
+        if glyph is None:
+            continue
+        mask = np.array([[c == '1' for c in row] for row in glyph])
+        mask = np.kron(mask, np.ones((scale, scale), dtype=bool))
+        x0 = x + i * advance
+        region = image[y:y + mask.shape[0], x0:x0 + mask.shape[1]]
+        region[mask[:region.shape[0], :region.shape[1]]] = color
+
+
+def make_contact_sheet(tiles, labels, columns=0, padding=4, label_scale=2, background=(0.1, 0.1, 0.1, 1.0)):
+    ''' Grid of tiles with label under each. Missing tiles (None) are left empty, so failed runs keep their place in grid '''
+    present = [tile for tile in tiles if tile is not None]
+    cell_h = max((tile.shape[0] for tile in present), default=16)
+    cell_w = max((tile.shape[1] for tile in present), default=16)
+    columns = columns or math.ceil(math.sqrt(len(tiles)))
+    rows = math.ceil(len(tiles) / columns)
+    label_h = GLYPH_H * label_scale + 2 * padding
+    step_x = cell_w + padding
+    step_y = cell_h + label_h + padding
+    sheet = np.empty((rows * step_y + padding, columns * step_x + padding, 4), dtype=np.float32)
+    sheet[:] = background
+    for index, (tile, label) in enumerate(zip(tiles, labels)):
+        x = padding + (index % columns) * step_x
+        y = padding + (index // columns) * step_y
+        if tile is not None:
+            sheet[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+        draw_text(sheet, label, x, y + cell_h + padding, label_scale)
+    return sheet
@@ -0,0 +1,101 @@
+'''
+Copyright (C) 2019 JOSECONSCO
+Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simple Asset Manager)
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+# One JSON line per texture-synthesis run. No bpy in here, so summary can be printed outside of blender:
+#   python tsynth_telemetry.py ~/.config/blender/2.80/config/texture_synthesis_cache/telemetry.jsonl
+
+import os
+import sys
+import json
+import time
+from collections import defaultdict
+
+
+def write_record(log_path, record):
+    record = dict(record, time=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    try:
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, sort_keys=True) + '\n')
+    except OSError as e:
+        print(f'Could not write telemetry to {log_path}: {e}')
+
+
+def read_records(log_path):
+    with open(log_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:  # line cut by crash
+                continue
+
+
+def summarize(records):
+    ''' Group finished runs by (out_size, k_neighs). Returns rows sorted by output pixel count '''
+    groups = defaultdict(list)
+    for record in records:
+        if record.get('status') != 'DONE':
+            continue
+        groups[(record.get('out_size', '?'), record.get('params', {}).get('k_neighs', '?'))].append(record)
+
+    def mean(values):
+        values = [v for v in values if v is not None]
+        return sum(values) / len(values) if values else None
+
+    def pixels(out_size):
+        try:
+            w, h = out_size.split('x')
+            return int(w) * int(h)
+        except ValueError:
+            return 0
+
+    rows = []
+    for (out_size, k_neighs), runs in groups.items():
+        rss = [r['peak_rss_mb'] for r in runs if r.get('peak_rss_mb') is not None]
+        rows.append({
+            'out_size': out_size,
+            'k_neighs': k_neighs,
+            'runs': len(runs),
+            'wall_time': mean(r.get('wall_time') for r in runs),
+            'cpu_time': mean((r['user_time'] + r['sys_time']) if r.get('user_time') is not None else None for r in runs),
+            'peak_rss_mb': max(rss) if rss else None,
+        })
+    rows.sort(key=lambda row: (pixels(row['out_size']), str(row['k_neighs'])))
+    return rows
+
+
+def format_summary(rows):
+    def fmt(value):
+        return '-' if value is None else f'{value:.1f}'
+    lines = [f'{"out_size":>12}{"k_neighs":>10}{"runs":>6}{"wall s":>10}{"cpu s":>10}{"peak MB":>10}']
+    for row in rows:
+        lines.append(f'{row["out_size"]:>12}{row["k_neighs"]!s:>10}{row["runs"]:>6}{fmt(row["wall_time"]):>10}{fmt(row["cpu_time"]):>10}{fmt(row["peak_rss_mb"]):>10}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print('Usage: python tsynth_telemetry.py <telemetry.jsonl>')
+        return 2
+    print(format_summary(summarize(read_records(argv[0]))))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+'''
+Copyright (C) 2019 JOSECONSCO
+Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simple Asset Manager)
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+# Small pre-scaled copies of source images, so preview icons do not decode full size 4k-8k textures on every refresh
+
+import bpy
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from .utils import get_cache_dir
+
+try:
+    import imbuf
+except ImportError:  # blender < 2.82 - thumbnails are generated on main thread, one per timer tick
+    imbuf = None
+
+THUMB_SIZE = 128
+EXECUTOR = None
+PENDING = {}  # file_path -> (thumb_path, Future or None if waits for main thread)
+
+
+def get_thumb_path(file_path):
+    ''' Thumbnail name depends on path, mtime and size - changed source file gets new thumbnail '''
+    stat = os.stat(file_path)
+    key = f'{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}'
+    return os.path.join(get_cache_dir('thumbs'), hashlib.sha1(key.encode()).hexdigest() + '.png')
+
+
+def make_thumbnail(file_path, thumb_path):
+    img = bpy.data.images.load(file_path)
+    try:
+        width, height = img.size
+        scale = THUMB_SIZE / max(width, height, 1)
+        if scale < 1:
+            img.scale(max(1, int(width * scale)), max(1, int(height * scale)))
+        tmp_path = thumb_path[:-4] + '.tmp.png'
+        img.filepath_raw = tmp_path
+        img.file_format = 'PNG'
+        img.save()
+        os.replace(tmp_path, thumb_path)
+    finally:
+        bpy.data.images.remove(img)
+
+
+def make_thumbnail_imbuf(file_path, thumb_path):
+    ''' Worker thread version - imbuf does not touch bpy.data '''
+    ibuf = imbuf.load(file_path)
+    try:
+        width, height = ibuf.size
+        scale = THUMB_SIZE / max(width, height, 1)
+        if scale < 1:
+            ibuf.resize((max(1, int(width * scale)), max(1, int(height * scale))), method='FAST')
+        if hasattr(ibuf, 'file_type'):
+            ibuf.file_type = 'PNG'
+        tmp_path = thumb_path[:-4] + '.tmp.png'
+        imbuf.write(ibuf, filepath=tmp_path)
+        os.replace(tmp_path, thumb_path)
+    finally:
+        ibuf.free()
+    return thumb_path
+
+
+def get_cached_thumbnail(file_path):
+    ''' Returns cached thumbnail path, or None - then thumbnail is generated in background. See collect_thumbnails() '''
+    global EXECUTOR
+    try:
+        thumb_path = get_thumb_path(file_path)
+    except OSError as e:
+        print(f'Could not generate thumbnail for {file_path}: {e}')
+        return file_path
+    if os.path.isfile(thumb_path):
+        return thumb_path
+    if file_path not in PENDING:
+        future = None
+        if imbuf is not None:
+            if EXECUTOR is None:
+                EXECUTOR = ThreadPoolExecutor(max_workers=max(1, min(4, (os.cpu_count() or 2) - 1)), thread_name_prefix='tsynth_thumbs')
+            future = EXECUTOR.submit(make_thumbnail_imbuf, file_path, thumb_path)
+        PENDING[file_path] = (thumb_path, future)
+    return None
+
+
+def collect_thumbnails():
+    ''' Returns [(file_path, thumb_path)] for thumbnails finished since last call. Source image path is used if thumbnail failed '''
+    finished = []
+    for file_path, (thumb_path, future) in list(PENDING.items()):
+        if future is None:  # no imbuf - make one thumbnail per call on main thread
+            if finished:
+                continue
+            try:
+                make_thumbnail(file_path, thumb_path)
+            except (RuntimeError, OSError) as e:
+                print(f'Could not generate thumbnail for {file_path}: {e}')
+                thumb_path = file_path
+        elif future.done():
+            if future.exception() is not None:
+                print(f'Could not generate thumbnail for {file_path}: {future.exception()}')
+                thumb_path = file_path
+        else:
+            continue
+        del PENDING[file_path]
+        finished.append((file_path, thumb_path))
+    return finished
+
+
+def shutdown():
+    global EXECUTOR
+    for thumb_path, future in PENDING.values():
+        if future is not None:
+            future.cancel()
+    PENDING.clear()
+    if EXECUTOR is not None:
+        EXECUTOR.shutdown(wait=False)
+        EXECUTOR = None
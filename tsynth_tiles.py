@@ -0,0 +1,235 @@
+'''
+Copyright (C) 2019 JOSECONSCO
+Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simple Asset Manager)
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+# Tiled synthesis of outputs too big for one texture-synthesis process. No bpy in here.
+# Output is split into overlapping tiles. First tile is plain 'generate', every next one is inpainted: pixels that overlap
+# already generated tiles are copied into its canvas and kept (white in inpaint mask), rest is synthesized to match them.
+# Tiles whose neighbours are done run in parallel. At the end tiles are feather blended band by band and streamed to PNG,
+# so memory of texture-synthesis processes depends on tile size, and of blending on tile height * output width.
+# With executor, canvas/mask encoding and blending run on its threads - in blender UI thread only submits jobs and loads result.
+
+import os
+import math
+import numpy as np
+
+try:
+    from . import tsynth_png
+    from . import tsynth_command
+except ImportError:  # run as script, outside of blender
+    import tsynth_png
+    import tsynth_command
+
+MASK_KEEP, MASK_FILL = 1.0, 0.0  # texture-synthesis inpaint map: white pixels are kept, black ones are resolved
+
+
+def read_png(file_path):
+    return np.flipud(tsynth_png.decode_png(file_path))
+
+
+def tile_positions(total, size, overlap):
+    ''' Start positions of tiles along one axis - evenly spread, neighbours overlap by at least overlap px '''
+    if total <= size:
+        return [0]
+    count = math.ceil((total - overlap) / (size - overlap))
+    return [round(i * (total - size) / (count - 1)) for i in range(count)]
+
+
+def ramp(size, start, end):
+    ''' Weights along tile axis: rise over first start px, fall over last end px. Overlapping ramps of neighbours sum to 1 '''
+    weights = np.ones(size, dtype=np.float32)
+    if start:
+        weights[:start] = (np.arange(start) + 0.5) / start
+    if end:
+        weights[size - end:] = (np.arange(end)[::-1] + 0.5) / end
+    return weights
+
+
+class Tile:
+    def __init__(self, row, col, x, y, width, height, out_path):
+        self.row = row
+        self.col = col
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.out_path = out_path
+        self.deps = []  # earlier tiles overlapping this one
+        self.submitted = False
+        self.done = False
+
+    def overlap(self, other):
+        ''' Intersection (x0, y0, x1, y1) in output coordinates, or None '''
+        x0, y0 = max(self.x, other.x), max(self.y, other.y)
+        x1, y1 = min(self.x + self.width, other.x + other.width), min(self.y + self.height, other.y + other.height)
+        return (x0, y0, x1, y1) if x0 < x1 and y0 < y1 else None
+
+
+class TiledSynthesis:
+    ''' Drives tile runs through submit(command, out_path, callback, wait_for) - callback(ok) has to be called once tile run is finished,
+    run must not start before wait_for futures (tile canvas and mask being written) are done.
+    on_finished(ok) is called after tiles are blended into out_path, or after first tile fails.
+    executor runs file work off caller's thread, then defer(future, callback) has to call callback(future) on caller's thread once future is done.
+    Without executor everything runs inline '''
+    def __init__(self, exe, settings, inputs, in_size, width, height, out_path, work_dir, tile_size=512, overlap=64, reader=read_png, on_finished=None,
+                 executor=None, defer=None):
+        if overlap * 2 >= tile_size:
+            raise ValueError('Tile overlap has to be less than half of tile size')
+        self.exe = exe
+        self.settings = dict(settings, tiling=False)  # tiles themselves must not wrap around
+        self.inputs = list(inputs)
+        self.in_size = in_size
+        self.width = width
+        self.height = height
+        self.out_path = out_path
+        self.work_dir = work_dir
+        self.reader = reader
+        self.on_finished = on_finished
+        self.executor = executor
+        self.defer = defer
+        self.failed = False
+        self.submit = None
+        os.makedirs(work_dir, exist_ok=True)
+
+        self.xs = tile_positions(width, tile_size, overlap)
+        self.ys = tile_positions(height, tile_size, overlap)
+        self.tile_w, self.tile_h = min(tile_size, width), min(tile_size, height)
+        self.tiles = []
+        for row, y in enumerate(self.ys):
+            for col, x in enumerate(self.xs):
+                tile = Tile(row, col, x, y, self.tile_w, self.tile_h, os.path.join(work_dir, f'tile_{row:02d}_{col:02d}.png'))
+                tile.deps = [other for other in self.tiles if tile.overlap(other)]
+                self.tiles.append(tile)
+
+    def start(self, submit):
+        self.submit = submit
+        self.submit_ready()
+
+    def submit_ready(self):
+        for tile in self.tiles:
+            if self.failed:  # callback of cached tile may run right inside submit()
+                return
+            if not tile.submitted and all(dep.done for dep in tile.deps):
+                tile.submitted = True
+                wait_for = []
+                try:
+                    command = self.tile_command(tile)
+                    if tile.deps and self.executor is not None:
+                        wait_for.append(self.executor.submit(self.write_tile_inputs, tile))  # job waits for it - error fails tile run
+                    elif tile.deps:
+                        self.write_tile_inputs(tile)
+                except (OSError, ValueError) as e:
+                    print(f'Preparing tile {tile.row},{tile.col} failed: {e}')
+                    self.fail()
+                    return
+                self.submit(command, tile.out_path, lambda ok, tile=tile: self.tile_finished(tile, ok), wait_for)
+
+    def tile_paths(self, tile):
+        base = tile.out_path[:-4]
+        return base + '_canvas.png', base + '_mask.png'
+
+    def tile_command(self, tile):
+        size = f'{tile.width}x{tile.height}'
+        if not tile.deps:
+            return tsynth_command.build_command(self.exe, dict(self.settings, gen_type='generate'), tile.out_path, self.inputs, self.in_size, size)
+        canvas_path, mask_path = self.tile_paths(tile)
+        # first example is the one being inpainted, source image(s) after it are what new pixels are sampled from
+        return tsynth_command.build_command(self.exe, dict(self.settings, gen_type='inpaint'), tile.out_path, [canvas_path] + self.inputs,
+                                            self.in_size, size, to_guide=mask_path)
+
+    def write_tile_inputs(self, tile):
+        ''' Canvas with pixels of finished neighbours, and inpaint mask keeping them. Safe to run on worker thread '''
+        canvas = np.zeros((tile.height, tile.width, 4), dtype=np.float32)
+        canvas[..., 3] = 1.0
+        mask = np.full((tile.height, tile.width, 4), MASK_FILL, dtype=np.float32)
+        mask[..., 3] = 1.0
+        for dep in tile.deps:
+            x0, y0, x1, y1 = tile.overlap(dep)
+            pixels = self.read(dep.out_path)
+            canvas[y0 - tile.y:y1 - tile.y, x0 - tile.x:x1 - tile.x] = pixels[y0 - dep.y:y1 - dep.y, x0 - dep.x:x1 - dep.x]
+            mask[y0 - tile.y:y1 - tile.y, x0 - tile.x:x1 - tile.x, :3] = MASK_KEEP
+        canvas_path, mask_path = self.tile_paths(tile)
+        tsynth_png.encode_png(np.flipud(canvas), canvas_path)
+        tsynth_png.encode_png(np.flipud(mask), mask_path)
+
+    def read(self, file_path):
+        pixels = self.reader(file_path)
+        if pixels is None:
+            raise ValueError(f'Could not read {file_path}')
+        return pixels
+
+    def tile_finished(self, tile, ok):
+        if self.failed:
+            return
+        if not ok:
+            print(f'Tile {tile.row},{tile.col} of {self.out_path} failed')
+            self.fail()
+            return
+        tile.done = True
+        if not all(t.done for t in self.tiles):
+            self.submit_ready()
+        elif self.executor is not None:
+            self.defer(self.executor.submit(self.blend), self.blend_finished)
+        else:
+            try:
+                self.blend()
+            except (OSError, ValueError) as e:
+                self.blend_failed(e)
+                return
+            if self.on_finished is not None:
+                self.on_finished(True)
+
+    def blend_finished(self, future):
+        error = future.exception()
+        if error is not None:
+            self.blend_failed(error)
+        elif self.on_finished is not None:
+            self.on_finished(True)
+
+    def blend_failed(self, error):
+        print(f'Blending tiles into {self.out_path} failed: {error}')
+        self.fail()
+
+    def fail(self):
+        self.failed = True
+        if self.on_finished is not None:
+            self.on_finished(False)
+
+    def blend(self):
+        ''' Feather blend tiles, one band of tile rows at a time. Rows above next band are final, so they are written and dropped.
+        Safe to run on worker thread '''
+        acc = np.zeros((self.tile_h, self.width, 4), dtype=np.float32)
+        weight_sum = np.zeros((self.tile_h, self.width, 1), dtype=np.float32)
+        x_ramps = [ramp(self.tile_w, self.xs[i - 1] + self.tile_w - x if i else 0, x + self.tile_w - self.xs[i + 1] if i + 1 < len(self.xs) else 0)
+                   for i, x in enumerate(self.xs)]
+        window_y = self.ys[0]
+        with tsynth_png.PNGWriter(self.out_path, self.width, self.height) as writer:
+            for row, y in enumerate(self.ys):
+                shift = y - window_y
+                if shift:
+                    acc[:-shift] = acc[shift:]
+                    acc[-shift:] = 0.0
+                    weight_sum[:-shift] = weight_sum[shift:]
+                    weight_sum[-shift:] = 0.0
+                    window_y = y
+                y_ramp = ramp(self.tile_h, self.ys[row - 1] + self.tile_h - y if row else 0, y + self.tile_h - self.ys[row + 1] if row + 1 < len(self.ys) else 0)
+                for tile in self.tiles[row * len(self.xs):(row + 1) * len(self.xs)]:
+                    weights = (y_ramp[:, None] * x_ramps[tile.col][None, :])[..., None]
+                    acc[:, tile.x:tile.x + tile.width] += self.read(tile.out_path)[:tile.height, :tile.width] * weights
+                    weight_sum[:, tile.x:tile.x + tile.width] += weights
+                next_y = self.ys[row + 1] if row + 1 < len(self.ys) else y + self.tile_h
+                writer.write_rows(acc[:next_y - y] / np.maximum(weight_sum[:next_y - y], 1e-6))
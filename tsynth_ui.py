@@ -19,6 +19,7 @@ Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simp
 import bpy
 import os
 from . import tsynth_props
+from . import tsynth_jobs
 
 MESSAGE = None
 
@@ -28,7 +29,10 @@ class VIEW_3D_UL_sel_imgs(bpy.types.UIList):
         # row = col.row(align=True)
         # for ico_name in tsynth_params.my_previews_multi:
         # layout.template_icon(pcoll[item.image_name].icon_id, scale=5.0)
-        layout.label(text=item.image_name, icon_value=pcoll[item.image_name].icon_id)
+        if item.image_name in pcoll:
+            layout.label(text=item.image_name, icon_value=pcoll[item.image_name].icon_id)
+        else:  # thumbnail is still generated
+            layout.label(text=item.image_name, icon='FILE_IMAGE')
 
     # def draw_filter(self, context, layout):
     #     pass
@@ -195,6 +199,12 @@ class TSYNTH_PT_TextureSynthesis(bpy.types.Panel):
             row.prop(tsynth_params, 'out_size_percent')
         row.prop(tsynth_params, 'out_size_from_preset', icon='PRESET', text='')
 
+        row = col.row(align=True)
+        row.prop(tsynth_params, 'tiled', icon='MESH_GRID')
+        if tsynth_params.tiled:
+            row.prop(tsynth_params, 'tile_size')
+            row.prop(tsynth_params, 'tile_overlap')
+
         #* OUTPUT
         box = layout.box()
         box.label(text='Output')
@@ -208,4 +218,19 @@ class TSYNTH_PT_TextureSynthesis(bpy.types.Panel):
         if tsynth_params.out_method != 'OVERRIDE' or tsynth_params.gen_type == 'multi-generate':
             col.prop(tsynth_params, 'output_file_name')
 
-        layout.operator("object.run_tsynthesis", icon='NODE_TEXTURE')
+        row = col.row(align=True)
+        row.prop(tsynth_params, 'live_update', icon='PLAY')
+        row.prop(tsynth_params, 'progressive', icon='RENDER_RESULT')
+        if tsynth_params.progressive or tsynth_params.live_update:
+            row.prop(tsynth_params, 'preview_percent')
+
+        row = layout.row(align=True)
+        row.operator("object.run_tsynthesis", icon='NODE_TEXTURE')
+        row.operator("object.tsynth_sweep", icon='IMGDISPLAY', text='')
+        row.operator("object.tsynth_export_queue", icon='EXPORT', text='')
+        jobs_status = tsynth_jobs.scheduler.status_text()
+        if jobs_status:
+            col = layout.column(align=True)
+            col.label(text=jobs_status, icon='SORTTIME')
+            for job in tsynth_jobs.scheduler.running[:5]:
+                col.label(text=job.progress_text(), icon='BLANK1')
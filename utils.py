@@ -18,6 +18,7 @@ Created by JOSECONSCO (loosely based on 'dynamic enum' blender template and Simp
 '''
 
 import bpy
+import os
 
 def get_addon_name():
     return __package__.split(".")[0]
@@ -27,3 +28,24 @@ def addon_name_lowercase():
 
 def get_addon_preferences():
     return bpy.context.preferences.addons[get_addon_name()].preferences
+
+def redraw_image_editors():
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'IMAGE_EDITOR':
+                area.tag_redraw()
+
+def get_cache_dir(name):
+    ''' Persistent cache folder in blender config dir: eg. ~/.config/blender/2.80/config/texture_synthesis_cache/<name> '''
+    return bpy.utils.user_resource('CONFIG', path=os.path.join('texture_synthesis_cache', name), create=True)
+
+def show_in_image_editor(img):
+    ''' Display img in first Image Editor that shows nothing, or shows image with the same name '''
+    image_editors = [area.spaces.active for window in bpy.context.window_manager.windows
+                     for area in window.screen.areas if area.type == 'IMAGE_EDITOR']
+    for space in image_editors:
+        if space.image is None or space.image == img:
+            space.image = img
+            return
+    if image_editors:
+        image_editors[0].image = img